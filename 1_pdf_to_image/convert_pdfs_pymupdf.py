@@ -1,47 +1,240 @@
 import fitz  # PyMuPDF
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def convert_pdf_to_images(pdf_path, output_folder='output_images', dpi=200, image_format='JPEG'):
+# Rendering scales poorly past ~6 processes, so cap the pool there.
+MAX_RENDER_WORKERS = 6
+# Smaller files than MuPDF's default encoder with no visible loss for OCR.
+JPEG_QUALITY = 85
+# A page with more extracted characters than this has a usable text layer (see gg.py).
+TEXT_LAYER_MIN_CHARS = 100
+# Pages rendered per worker task before their files are written out.
+PAGES_PER_BLOCK = 16
+
+
+def _encode_pixmap(pix, image_format):
+    """Encodes a rendered pixmap to image bytes (runs on the encoder thread)."""
+    if image_format.upper() in ("JPEG", "JPG"):
+        return pix.tobytes(output="jpeg", jpg_quality=JPEG_QUALITY)
+    return pix.tobytes(output=image_format.lower())
+
+
+def _render_page(page, i, output_folder, dpi, image_format, encoder):
+    """
+    Renders one page and returns (path, data) for the caller to write, where
+    data is bytes or a Future from `encoder` that resolves to bytes.
+    Pages that already have a text layer come back as page_N.txt instead of
+    being rasterized, so they never reach the image classifier or OCR.
+    """
+    text = page.get_text("text")
+    if len(text.strip()) > TEXT_LAYER_MIN_CHARS:
+        return os.path.join(output_folder, f"page_{i + 1}.txt"), text.encode("utf-8")
+
+    # Downstream OCR only works on gray, so render one channel instead of three.
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    image_path = os.path.join(output_folder, f"page_{i + 1}.{image_format.lower()}")
+    # Encode off the render loop so the next page renders while this one compresses.
+    return image_path, encoder.submit(_encode_pixmap, pix, image_format)
+
+
+def _render_block(pdf_path, start, stop, output_folder, dpi, image_format, doc=None):
+    """
+    Worker: renders pages [start, stop) and then writes them in one tight loop.
+    Re-opens the PDF inside the worker so no fitz.Document has to be pickled;
+    a block of pages amortizes that open and the process round-trip.
+    In-process callers pass their open `doc`, which is left open for them.
+    Returns the list of saved paths.
+    """
+    pending = []
+    owns_doc = doc is None
+    if owns_doc:
+        try:
+            doc = fitz.open(pdf_path)
+        except Exception as e:
+            print(f"⚠️ Could not open {pdf_path}: {e}")
+            return []
+
+    try:
+        # MuPDF rendering and image encoding both release the GIL, so a
+        # render thread plus an encode thread overlap on two cores.
+        with ThreadPoolExecutor(max_workers=2) as encoder:
+            for i in range(start, stop):
+                try:
+                    pending.append(
+                        (i,) + _render_page(doc[i], i, output_folder, dpi, image_format, encoder)
+                    )
+                except Exception as e:
+                    print(f"⚠️ Error rendering page {i + 1}: {e}")
+
+            rendered = []
+            for i, path, data in pending:
+                try:
+                    rendered.append((path, data if isinstance(data, bytes) else data.result()))
+                except Exception as e:
+                    print(f"⚠️ Error encoding page {i + 1}: {e}")
+    finally:
+        if owns_doc:
+            doc.close()
+        # MuPDF's font/image store is unbounded by default; empty it so
+        # long scanned PDFs don't grow RSS block after block.
+        fitz.TOOLS.store_shrink(100)
+
+    saved_pages = []
+    for path, data in rendered:
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+            saved_pages.append(path)
+            print(f"✅ Saved {path}")
+        except OSError as e:
+            print(f"⚠️ Could not write {path}: {e}")
+    return saved_pages
+
+
+def convert_pdf_to_images(pdf_path, output_folder='output_images', dpi=150, image_format='JPEG', max_workers=None):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
-    
+
     try:
         doc = fitz.open(pdf_path)
-        print(f"✅ Opened {pdf_path} | Total pages: {len(doc)}")
+        page_count = len(doc)
+        print(f"✅ Opened {pdf_path} | Total pages: {page_count}")
     except Exception as e:
         print(f"⚠️ Could not open {pdf_path}: {e}")
         return []
-    
-    saved_images = []
-    for i, page in enumerate(doc):
+
+    if max_workers is None:
+        max_workers = min(os.cpu_count() or 1, MAX_RENDER_WORKERS)
+
+    starts = range(0, page_count, PAGES_PER_BLOCK)
+    n_blocks = len(starts)
+    args = (
+        [pdf_path] * n_blocks, starts,
+        [min(start + PAGES_PER_BLOCK, page_count) for start in starts],
+        [output_folder] * n_blocks, [dpi] * n_blocks, [image_format] * n_blocks
+    )
+    if max_workers <= 1:
+        # Already inside a worker (e.g. the per-PDF pool below): render
+        # in-process, reusing the document opened above for every block.
         try:
-            pix = page.get_pixmap(dpi=dpi)
-            image_path = os.path.join(output_folder, f"page_{i + 1}.{image_format.lower()}")
-            pix.save(image_path)
-            saved_images.append(image_path)
-            print(f"✅ Saved {image_path}")
-        except Exception as e:
-            print(f"⚠️ Error rendering page {i + 1}: {e}")
-    
-    doc.close()
-    print(f"🎉 Done! {len(saved_images)} pages saved in '{output_folder}'.")
-    return saved_images
+            blocks = map(_render_block, *args, [doc] * n_blocks)
+            saved_pages = [path for block in blocks for path in block]
+        finally:
+            doc.close()
+            fitz.TOOLS.store_shrink(100)
+    else:
+        # Workers open their own copy; release this one before forking them.
+        doc.close()
+        fitz.TOOLS.store_shrink(100)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            blocks = executor.map(_render_block, *args)
+            saved_pages = [path for block in blocks for path in block]
+
+    print(f"🎉 Done! {len(saved_pages)} pages saved in '{output_folder}'.")
+    return saved_pages
+
+
+def _has_text_layer(doc):
+    """Samples the first, middle and last page of an open document for a real text layer."""
+    n = len(doc)
+    for i in sorted({0, n // 2, n - 1}):
+        if 0 <= i < n and len(doc[i].get_text("text").strip()) > TEXT_LAYER_MIN_CHARS:
+            return True
+    return False
+
+
+def has_text_layer(pdf_path):
+    """
+    Cheap check (same idea as gg.py): samples the first, middle and last page
+    and returns True if any of them has a real text layer.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return _has_text_layer(doc)
+    finally:
+        doc.close()
+
+
+def _extract_text_layer(doc, pdf_path, output_folder):
+    """Writes each page of an open document to page_N.txt and returns the saved paths."""
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    saved_pages = []
+    for i, page in enumerate(doc):
+        txt_path = os.path.join(output_folder, f"page_{i + 1}.txt")
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(page.get_text("text"))
+        saved_pages.append(txt_path)
+
+    print(f"📄 {pdf_path} has a text layer: {len(saved_pages)} pages extracted to '{output_folder}'.")
+    return saved_pages
+
+
+def extract_text_layer(pdf_path, output_folder):
+    """
+    Writes each page's embedded text to page_N.txt, without rasterizing anything.
+    Returns the list of saved paths.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return _extract_text_layer(doc, pdf_path, output_folder)
+    finally:
+        doc.close()
+        fitz.TOOLS.store_shrink(100)
+
+
+def convert_pdf(pdf_path, output_folder, max_workers=None):
+    """
+    Extracts the text layer of digital PDFs, and rasterizes the rest.
+    The PDF is opened once for both the check and the text extraction.
+    """
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        print(f"⚠️ Could not open {pdf_path}: {e}")
+        return []
+
+    try:
+        if _has_text_layer(doc):
+            return _extract_text_layer(doc, pdf_path, output_folder)
+    finally:
+        doc.close()
+        fitz.TOOLS.store_shrink(100)
+
+    return convert_pdf_to_images(pdf_path, output_folder, max_workers=max_workers)
 
 # Example usage:
 if __name__ == "__main__":
     input_folder = r"G:\Project\PDF_TO_TEXT\0_Input_folder"
     output_base = r"G:\Project\PDF_TO_TEXT\1_pdf_to_image\output_images"
-    
+
     if not os.path.exists(output_base):
         os.makedirs(output_base)
-    
+
     pdf_files = [f for f in os.listdir(input_folder) if f.lower().endswith(".pdf")]
-    
+
     if not pdf_files:
         print("⚠️ No PDF files found!")
     else:
-        for pdf in pdf_files:
-            pdf_path = os.path.join(input_folder, pdf)
-            out_folder = os.path.join(output_base, os.path.splitext(pdf)[0])
-            print(f"\nConverting {pdf} ...")
-            convert_pdf_to_images(pdf_path, out_folder)
+        cpu_count = os.cpu_count() or 1
+        # One process per PDF; leftover cores go to per-page rendering so the
+        # two pools together never exceed the core count.
+        pdf_workers = min(len(pdf_files), cpu_count)
+        page_workers = min(cpu_count // pdf_workers, MAX_RENDER_WORKERS)
+
+        with ProcessPoolExecutor(max_workers=pdf_workers) as executor:
+            futures = {}
+            for pdf in pdf_files:
+                pdf_path = os.path.join(input_folder, pdf)
+                out_folder = os.path.join(output_base, os.path.splitext(pdf)[0])
+                print(f"\nConverting {pdf} ...")
+                futures[pdf] = executor.submit(
+                    convert_pdf, pdf_path, out_folder, max_workers=page_workers
+                )
+
+            for pdf, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"⚠️ Failed to convert {pdf}: {e}")
@@ -26,10 +26,14 @@ cv2.circle(img1,(150,150),100,255,-1)
 cv2.rectangle(img2,(100,100),(250,250),255,-1)
 
 #Bitwise Operation
-bitwise_and = cv2.bitwise_and(img1, img2, mask=None)	#Keeps overlapping (common) parts
-bitwise_or = cv2.bitwise_or(img1, img2, mask=None)	#Combines both images
-bitwise_xor = cv2.bitwise_xor(img1, img2, mask=None)	#Keeps non-overlapping areas
-bitwise_not = cv2.bitwise_not(img1)	
+# For small arrays the per-call overhead of cv2 dominates, so use NumPy's
+# ufuncs and write all four results into one pre-allocated stack.
+imgs = np.stack([img1, img2])
+results = np.empty((4,) + img1.shape, dtype="uint8")
+bitwise_and = np.bitwise_and(imgs[0], imgs[1], out=results[0])	#Keeps overlapping (common) parts
+bitwise_or = np.bitwise_or(imgs[0], imgs[1], out=results[1])	#Combines both images
+bitwise_xor = np.bitwise_xor(imgs[0], imgs[1], out=results[2])	#Keeps non-overlapping areas
+bitwise_not = np.bitwise_not(imgs[0], out=results[3])	#Inverts pixels
 
 cv2.imshow("Original image1",img1)
 cv2.imshow("Original image2",img2)
@@ -1,8 +1,9 @@
 import os
-import json
+import functools
 import google.generativeai as genai
 from pptx import Presentation
 from pptx.util import Inches, Pt
+from slides_json import parse_slides
 
 # --------------------------------
 # CONFIGURATION
@@ -41,8 +42,13 @@ def read_text_file(path):
 # --------------------------------
 # CORE: GEMINI LOGIC
 # --------------------------------
+@functools.lru_cache(maxsize=1)
+def _get_model():
+    """Builds the Gemini model once and reuses it for every request."""
+    return genai.GenerativeModel(MODEL_NAME)
+
 def get_ai_response(prompt):
-    model = genai.GenerativeModel(MODEL_NAME)
+    model = _get_model()
     try:
         response = model.generate_content(prompt)
         text = response.text.strip()
@@ -88,7 +94,7 @@ def print_blueprint(slides_data):
     print(" 📊 PRESENTATION BLUEPRINT (PREVIEW)")
     print("="*50)
     try:
-        data = json.loads(slides_data)
+        data = parse_slides(slides_data)
         for i, slide in enumerate(data, 1):
             print(f"\n[SLIDE {i}]: {slide['title']}")
             for bullet in slide['content']:
@@ -102,7 +108,7 @@ def print_blueprint(slides_data):
 def create_pptx(slides_data, output_path, template_file=None):
     """Converts the JSON structure into a .pptx using a template if available."""
     try:
-        data = json.loads(slides_data)
+        data = parse_slides(slides_data)
     except:
         print("❌ Failed to parse data.")
         return
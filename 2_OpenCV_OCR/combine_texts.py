@@ -16,16 +16,20 @@ def combine_texts_in_folder(base_folder):
 
     combined_path = os.path.join(base_folder, "combined_output.txt")
 
-    with open(combined_path, "w", encoding="utf-8") as outfile:
-        for txt_file in sorted(txt_files):
-            txt_path = os.path.join(base_folder, txt_file)
+    # Build the whole output in memory and write it with a single call
+    parts = []
+    for txt_file in sorted(txt_files):
+        txt_path = os.path.join(base_folder, txt_file)
+
+        parts.append(f"\n\n---- {txt_file} ----\n\n")
 
-            outfile.write(f"\n\n---- {txt_file} ----\n\n")
+        with open(txt_path, "r", encoding="utf-8") as infile:
+            parts.append(infile.read())
 
-            with open(txt_path, "r", encoding="utf-8") as infile:
-                outfile.write(infile.read())
+        parts.append("\n" + "=" * 50 + "\n")
 
-            outfile.write("\n" + "=" * 50 + "\n")
+    with open(combined_path, "w", encoding="utf-8") as outfile:
+        outfile.write("".join(parts))
 
     print(f"✅ Combined {len(txt_files)} files into: {combined_path}")
     return combined_path
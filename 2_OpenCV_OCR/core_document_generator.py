@@ -1,12 +1,20 @@
 import json
 import io
+import copy
+import math
+import random
+import re
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import time
-import os
-import base64
-from google import genai
 from google.genai import Client
-from google.genai.types import Content, Part, GenerateContentConfig
-from PIL import Image
+from google.genai.types import Part, GenerateContentConfig
+import httpx
+from slides_json import load_slides
+from gemini_rate import wait_for_slot, record_rate_limited, record_success
+from result_cache import cache_key, cache_get, cache_put
 
 try:
     from pptx_designer import create_pptx_with_style as create_pptx
@@ -15,6 +23,7 @@ except ImportError:
     
 try:
     from docx import Document
+    from docx.oxml import OxmlElement
 except ImportError:
     Document = None
 
@@ -23,64 +32,337 @@ try:
 except ImportError:
     fitz = None
 
-try:
-    import pytesseract
-except ImportError:
-    pytesseract = None
-
-try:
-    import cv2
-    import numpy as np
-except ImportError:
-    cv2 = None
-    np = None
-
 try:
     from google.genai import Client
-    from google.genai.types import GenerateContentConfig
+    from google.genai.types import GenerateContentConfig, HttpOptions
 except ImportError:
     Client = None
     GenerateContentConfig = None
+    HttpOptions = None
+
+try:
+    import h2 # Enables HTTP/2 in httpx
+except ImportError:
+    h2 = None
 
 # --------------------------------
 # CONFIGURATION
 # --------------------------------
-GENAI_CLIENT = None
+# Built once; only the raw text is appended per call.
+SLIDES_INSTRUCTIONS = (
+    "Review the text and generate a structured, clean JSON list suitable for a presentation. "
+    "The JSON MUST follow this exact schema: "
+    "[{'title': 'Slide Title 1', 'content': ['Point 1', 'Point 2', '...', 'Point N']}, "
+    "{'title': 'Slide Title 2', 'content': ['Point 1', 'Point 2', '...']}, ...]. "
+    "Infer logical slide breaks from the content (e.g., section headings, major topic changes). "
+    "Use simple bullet points in the 'content' lists. Do not use Markdown formatting in the lists."
+)
+CLEAN_PROMPT = (
+    "The following text was extracted from a document. "
+    + SLIDES_INSTRUCTIONS + "\n\nRAW TEXT:\n---\n"
+)
+# Image uploads are read and structured by the same call
+IMAGE_SLIDES_PROMPT = "Read ALL text in this image accurately. " + SLIDES_INSTRUCTIONS
+
+# Raw text is structured in chunks of about 4000 tokens (~4 chars each), cut on
+# page boundaries, so long PDFs are neither truncated nor sent as one request.
+CLEAN_CHUNK_CHARS = 16000
+CLEAN_MAX_WORKERS = 8
+# Pages from the end of the previous chunk shown as read-only context, so
+# sections that straddle a chunk boundary are structured consistently.
+CLEAN_CHUNK_OVERLAP_PAGES = 1
+# Concurrent Gemini Vision OCR calls per PDF
+OCR_MAX_WORKERS = 8
+# Scanned pages sent together in one Gemini Vision request
+OCR_PAGES_PER_REQUEST = 8
+# Render settings for pages sent to Gemini Vision, which tokenizes images by
+# resolution: 150 dpi reads cleanly, full-page scans get a bit more, and an
+# oversized image is re-rendered smaller to fit the byte budget.
+OCR_DPI = 150
+OCR_SCAN_DPI = 220
+OCR_MIN_DPI = 96
+# Long-edge cap in pixels, so large page sizes (A3, posters) get a lower dpi
+OCR_MAX_EDGE_PX = 2400
+OCR_IMAGE_BUDGET_BYTES = 300_000
+# JPEG encodes far faster than PNG's deflate and is ~3x smaller for scanned text
+OCR_JPEG_QUALITY = 85
+# Cap on Gemini requests in flight across all pools, to stay under the quota
+GEMINI_MAX_IN_FLIGHT = 8
+_gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_IN_FLIGHT)
+# Topic-only outlines (a one-line prompt) go to the lite model and are
+# cached per (topic, instruction) for an hour, oldest evicted first.
+TOPIC_MODEL_NAME = "gemini-flash-lite-latest"
+TOPIC_CACHE_TTL = 3600
+TOPIC_CACHE_MAX_ENTRIES = 256
+_topic_cache = {}
+_topic_cache_lock = threading.Lock()
+# Upper bound on a single backoff sleep between retries
+RETRY_MAX_DELAY = 60
+# Client errors worth retrying; any other 4xx (bad key, bad request) fails at once
+RETRYABLE_CLIENT_STATUS = {408, 429}
+# Per-request HTTP timeout for Gemini calls, in milliseconds
+GEMINI_TIMEOUT_MS = 60_000
+# OCR'd texts are cached by image content hash + model (see result_cache),
+# so re-uploaded pages skip the Gemini call.
+OCR_MODEL_NAME = "gemini-flash-latest"
+
+# JSON schema shared by every call that returns a slide list; the config is
+# built once at import instead of per request. Bump the version whenever the
+# schema or the outline prompt changes, so cached outlines are not reused.
+SLIDES_SCHEMA_VERSION = 1
+SLIDES_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "description": "The title of the presentation slide."},
+            "content": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "A list of bullet points for the slide content."
+            }
+        },
+        "required": ["title", "content"]
+    }
+}
+SLIDES_CONFIG = GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=SLIDES_SCHEMA
+) if GenerateContentConfig else None
+# Batched OCR answers with one string per page image
+PAGE_TEXTS_CONFIG = GenerateContentConfig(
+    temperature=0.0,
+    response_mime_type="application/json",
+    response_schema={"type": "array", "items": {"type": "string"}}
+) if GenerateContentConfig else None
+
+_client_lock = threading.Lock()
+_clean_executor = None
+
+@functools.lru_cache(maxsize=4)
+def _make_client(api_key):
+    """
+    Builds a client whose single httpx connection pool is shared by every
+    worker thread, sized for GEMINI_MAX_IN_FLIGHT requests and kept alive
+    between calls; HTTP/2 multiplexes them over one connection when h2 is installed.
+    """
+    client_args = {
+        "limits": httpx.Limits(
+            max_connections=GEMINI_MAX_IN_FLIGHT,
+            max_keepalive_connections=GEMINI_MAX_IN_FLIGHT,
+        ),
+        "http2": h2 is not None,
+    }
+    try:
+        return Client(
+            api_key=api_key,
+            http_options=HttpOptions(timeout=GEMINI_TIMEOUT_MS, client_args=client_args)
+        )
+    except Exception:
+        # Older google-genai without client_args: keep its default pool
+        return Client(api_key=api_key)
 
 def _get_genai_client(api_key):
-    """Initializes and returns the global Gemini API client."""
-    global GENAI_CLIENT
-    if GENAI_CLIENT is None:
-        if not api_key:
-            raise ValueError("Gemini API Key is required.")
-        GENAI_CLIENT = Client(api_key=api_key)
-    return GENAI_CLIENT
+    """
+    Returns the Gemini API client for `api_key`, creating it on first use.
+    Clients are cached per key so the connection setup happens once; the lock
+    stops concurrent OCR/structuring workers from each building their own.
+    """
+    if not api_key:
+        raise ValueError("Gemini API Key is required.")
+    with _client_lock:
+        return _make_client(api_key)
+
+def _get_clean_executor():
+    """
+    Returns the structuring thread pool shared by every document, so each
+    upload doesn't spin up and tear down its own worker threads.
+    """
+    global _clean_executor
+    with _client_lock:
+        if _clean_executor is None:
+            _clean_executor = ThreadPoolExecutor(
+                max_workers=CLEAN_MAX_WORKERS, thread_name_prefix="gemini-clean"
+            )
+        return _clean_executor
+
+def shutdown_clients():
+    """
+    Drops the cached Gemini clients and shuts down the shared structuring
+    pool (e.g. between tests). Both are recreated on next use.
+    """
+    global _clean_executor
+    with _client_lock:
+        executor, _clean_executor = _clean_executor, None
+        _make_client.cache_clear()
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def _retry_after_seconds(error):
+    """Returns the server's Retry-After delay in seconds, if the error carries one."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+def _status_code(error):
+    """Returns the HTTP status of a failed call, or None for network errors."""
+    # google.genai APIError exposes .code, httpx errors carry the response
+    for status in (getattr(error, "code", None), getattr(error, "status_code", None),
+                   getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(status, int):
+            return status
+    return None
+
+def _is_retryable(error):
+    status = _status_code(error)
+    return status is None or status >= 500 or status in RETRYABLE_CLIENT_STATUS
 
 def _retry_api_call(func, *args, **kwargs):
-    """Implements exponential backoff for API calls."""
+    """
+    Implements exponential backoff for API calls.
+    Delays are capped and jittered so concurrent workers that hit the rate
+    limit together don't all retry in lockstep; a Retry-After from the server wins.
+    Permanent client errors (e.g. an invalid key) are raised without retrying.
+    Calls are paced by gemini_rate, which slows down after each 429.
+    """
     max_retries = 5
     for attempt in range(max_retries):
         try:
-            return func(*args, **kwargs)
+            with _gemini_slots:
+                wait_for_slot()
+                result = func(*args, **kwargs)
+            record_success()
+            return result
         except Exception as e:
-            if attempt < max_retries - 1:
-                delay = 2 ** attempt
-                print(f"API Error: {e}. Retrying in {delay} seconds...")
+            if _status_code(e) == 429:
+                record_rate_limited()
+            if attempt < max_retries - 1 and _is_retryable(e):
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    delay = min(RETRY_MAX_DELAY, 2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"API Error: {e}. Retrying in {delay:.1f} seconds...")
                 time.sleep(delay)
             else:
                 raise
 
-def extract_text_gemini(image_bytes, api_key):
+def _pack_pages(page_texts, max_chars=CLEAN_CHUNK_CHARS, overlap=CLEAN_CHUNK_OVERLAP_PAGES):
+    """
+    Greedily packs consecutive page texts into chunks of at most max_chars.
+    Yields (context, chunk) as soon as each chunk is full, so `page_texts` can
+    be a lazy iterator; context is the last `overlap` pages of the previous chunk.
+    """
+    context = ""
+    current = []
+    size = 0
+    for text in page_texts:
+        if current and size + len(text) > max_chars:
+            yield context, "".join(current)
+            context = "".join(current[-overlap:]) if overlap else ""
+            current = []
+            size = 0
+        current.append(text)
+        size += len(text)
+    if current:
+        yield context, "".join(current)
+
+# Local structuring only for text that already has explicit Markdown
+# headings; anything looser (e.g. short capitalized lines) is too easily
+# fooled by a sentence cut off at a page break, so it goes to Gemini.
+MIN_LOCAL_HEADINGS = 3
+# A page marker together with the blank lines around it. Pages are rejoined
+# with a plain newline so a sentence running across the break stays whole.
+_PAGE_MARKER_RE = re.compile(r'\s*^--- PAGE \d+ ---$\s*', re.M)
+_HEADING_RE = re.compile(r'^[ \t]*#{1,6}[ \t]+([^\n]+?)(?:[ \t]+#+)?[ \t]*$', re.M)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+def _structure_locally(raw_text):
+    """
+    Builds the slide list without Gemini when the text already has at least
+    MIN_LOCAL_HEADINGS Markdown headings: each heading becomes a slide title
+    and the sentences under it become its bullet points.
+    Returns None when the text isn't structured clearly enough, including
+    when there is text before the first heading that no slide would cover.
+    """
+    text = _PAGE_MARKER_RE.sub('\n', raw_text)
+    headings = list(_HEADING_RE.finditer(text))
+    if len(headings) < MIN_LOCAL_HEADINGS or text[:headings[0].start()].strip():
+        return None
+
+    slides = []
+    for heading, next_heading in zip(headings, headings[1:] + [None]):
+        body = text[heading.end():next_heading.start() if next_heading else len(text)]
+        sentences = _SENTENCE_SPLIT_RE.split(" ".join(body.split()))
+        content = [sentence for sentence in sentences if sentence]
+        if content:
+            slides.append({"title": heading.group(1).strip(), "content": content})
+
+    return slides if len(slides) >= MIN_LOCAL_HEADINGS else None
+
+def _structure_chunk(client, context, raw_text):
+    """
+    Structures one chunk of raw text into a list of slide dicts.
+    Text with clear headings is structured locally, saving the Gemini call.
+    """
+    slides = _structure_locally(raw_text)
+    if slides is not None:
+        print(f"🧩 Structured {len(slides)} slides locally from existing headings.")
+        return slides
+
+    prompt = CLEAN_PROMPT + raw_text + "\n---"
+    if context:
+        prompt += (
+            "\n\nFor continuity only, this text directly precedes the RAW TEXT. "
+            "Do NOT create slides from it:\n---\n" + context + "\n---"
+        )
+    response = _retry_api_call(
+        client.models.generate_content,
+        model="gemini-flash-latest",
+        contents=prompt,
+        config=SLIDES_CONFIG
+    )
+    return json.loads(response.text)
+
+def _structure_image(client, image_bytes, mime_type):
+    """
+    Reads an image and structures its text into a list of slide dicts with
+    a single Gemini Vision call, instead of extracting the raw text first.
+    """
+    parts = [
+        Part.from_bytes(data=image_bytes, mime_type=mime_type),
+        Part.from_text(text=IMAGE_SLIDES_PROMPT),
+    ]
+    response = _retry_api_call(
+        client.models.generate_content,
+        model="gemini-flash-latest",
+        contents=parts,
+        config=SLIDES_CONFIG
+    )
+    return json.loads(response.text)
+
+def _ocr_cache_key(image_bytes):
+    return cache_key(image_bytes, OCR_MODEL_NAME)
+
+def extract_text_gemini(image_bytes, api_key, mime_type="image/png", use_cache=True):
     """
     Uses the Gemini API with vision capabilities to extract text from an image.
     
     Args:
         image_bytes (bytes): Byte content of the image (e.g., PNG).
         api_key (str): The Gemini API key.
+        mime_type (str): MIME type of image_bytes.
+        use_cache (bool): Reuse the text of an identical image OCR'd before.
         
     Returns:
         str: The extracted text, or None if extraction fails.
     """
+    key = _ocr_cache_key(image_bytes) if use_cache else None
+    if key is not None:
+        cached = cache_get(key)
+        if cached is not None:
+            return cached, None
+
     try:
         client = _get_genai_client(api_key)
     except ValueError as e:
@@ -88,7 +370,7 @@ def extract_text_gemini(image_bytes, api_key):
         
     parts = [
         # 1. Image part
-        Part.from_bytes(data=image_bytes, mime_type="image/png"),
+        Part.from_bytes(data=image_bytes, mime_type=mime_type),
         
         # 2. Text instruction part
         Part.from_text(text="Extract ALL text accurately from this image. Preserve line breaks and formatting. Do NOT summarize or add commentary. Return ONLY the raw text."),
@@ -97,166 +379,321 @@ def extract_text_gemini(image_bytes, api_key):
     try:
         response = _retry_api_call(
             client.models.generate_content,
-            model="gemini-flash-latest",
+            model=OCR_MODEL_NAME,
             contents=parts,
             config=GenerateContentConfig(temperature=0.0)
         )
-        return response.text, None
-        
     except Exception as e:
         return None, f"Gemini API call failed during text extraction: {e}"
 
+    if key is not None and response.text:
+        cache_put(key, response.text)
+    return response.text, None
+
+
+def extract_text_gemini_batch(images, api_key, mime_type="image/png", use_cache=True):
+    """
+    Extracts the text of several page images with a single Gemini Vision call.
+    Images already in the OCR cache are left out of the request.
+    
+    Returns:
+        (list[str], None) with one text per image, in order, or (None, error).
+    """
+    if use_cache:
+        cache_keys = [_ocr_cache_key(image_bytes) for image_bytes in images]
+        texts = [cache_get(key) for key in cache_keys]
+    else:
+        texts = [None] * len(images)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if not missing:
+        return texts, None
+
+    try:
+        client = _get_genai_client(api_key)
+    except ValueError as e:
+        return None, str(e)
+
+    parts = []
+    for i, image_bytes in enumerate((images[i] for i in missing), start=1):
+        parts.append(Part.from_text(text=f"--- image {i} ---"))
+        parts.append(Part.from_bytes(data=image_bytes, mime_type=mime_type))
+    parts.append(Part.from_text(text=(
+        f"Extract ALL text accurately from each of the {len(missing)} images above. "
+        "Preserve line breaks and formatting. Do NOT summarize or add commentary. "
+        "Return a JSON array with exactly one string per image, in order."
+    )))
+
+    try:
+        response = _retry_api_call(
+            client.models.generate_content,
+            model=OCR_MODEL_NAME,
+            contents=parts,
+            config=PAGE_TEXTS_CONFIG
+        )
+        new_texts = json.loads(response.text)
+    except Exception as e:
+        return None, f"Gemini API call failed during batched text extraction: {e}"
+
+    if not isinstance(new_texts, list) or len(new_texts) != len(missing) or not all(isinstance(t, str) for t in new_texts):
+        return None, f"Expected {len(missing)} page texts from the batched extraction."
+    for i, text in zip(missing, new_texts):
+        texts[i] = text
+        if use_cache and text:
+            cache_put(cache_keys[i], text)
+    return texts, None
+
+
+def _mark_page(page_num, page_text):
+    return f"\n\n--- PAGE {page_num + 1} ---\n\n{page_text}"
+
+def _ocr_page_image(page_num, img_bytes, api_key):
+    """Runs Gemini Vision OCR on one rendered page."""
+    page_text, error = extract_text_gemini(img_bytes, api_key, mime_type="image/jpeg")
+    
+    if error:
+        print(f"Warning: Failed to process page {page_num+1}. Error: {error}")
+        page_text = f"[ERROR: Could not extract page {page_num+1}]" 
+    return _mark_page(page_num, page_text)
+
+def _ocr_page_batch(pages, api_key):
+    """
+    Worker: OCRs a batch of rendered pages, [(page_num, img_bytes), ...], with
+    one Gemini call, and returns their marked texts in order. Falls back to one
+    call per page if the batched answer can't be matched up with the pages.
+    """
+    if len(pages) > 1:
+        texts, error = extract_text_gemini_batch([img for _, img in pages], api_key, mime_type="image/jpeg")
+        if texts is not None:
+            return [_mark_page(page_num, text) for (page_num, _), text in zip(pages, texts)]
+        print(f"Warning: Batched OCR failed ({error}). Retrying page by page.")
+    return [_ocr_page_image(page_num, img_bytes, api_key) for page_num, img_bytes in pages]
+
+def _render_page_for_ocr(page):
+    """
+    Renders a page to grayscale JPEG bytes for Gemini Vision.
+    Crops to the area that actually has content, uses a higher dpi for
+    full-page scans, and re-renders smaller if the image exceeds the byte budget.
+    Returns None for a blank page (nothing is drawn on it), which needs no OCR.
+    """
+    # One pass over the page's draw log gives both the content area and the
+    # image boxes; get_image_info() would build a whole extra TextPage for that.
+    bboxlog = page.get_bboxlog()
+    if not bboxlog:
+        return None
+
+    page_rect = page.rect
+    page_area = page_rect.get_area()
+    clip = fitz.Rect()
+    is_scan = False
+    for kind, bbox in bboxlog:
+        rect = fitz.Rect(bbox)
+        clip |= rect
+        # A single image covering most of the page is a scan: give it more pixels
+        if kind == "fill-image" and rect.get_area() >= 0.9 * page_area:
+            is_scan = True
+    clip = (clip + (-12, -12, 12, 12)) & page_rect  # keep a small margin
+    if clip.is_empty:
+        clip = page_rect
+
+    dpi = OCR_SCAN_DPI if is_scan else OCR_DPI
+    # Pick the dpi from the content size up front rather than re-rendering later
+    dpi = max(OCR_MIN_DPI, min(dpi, int(OCR_MAX_EDGE_PX * 72 / max(clip.width, clip.height))))
+
+    pix = page.get_pixmap(dpi=dpi, clip=clip, colorspace=fitz.csGRAY, alpha=False)
+    img_bytes = pix.tobytes("jpeg", jpg_quality=OCR_JPEG_QUALITY)
+    if len(img_bytes) > OCR_IMAGE_BUDGET_BYTES:
+        # Encoded size grows roughly with pixel count, i.e. with dpi squared
+        dpi = max(OCR_MIN_DPI, int(dpi * math.sqrt(OCR_IMAGE_BUDGET_BYTES / len(img_bytes))))
+        pix = page.get_pixmap(dpi=dpi, clip=clip, colorspace=fitz.csGRAY, alpha=False)
+        img_bytes = pix.tobytes("jpeg", jpg_quality=OCR_JPEG_QUALITY)
+    return img_bytes
+
+def _read_page(doc, page_num):
+    """
+    Returns the page's marked text (str) when its digital text layer is
+    substantial, or else the page rendered for Gemini Vision OCR (bytes),
+    or None when the page is blank.
+    """
+    page = doc.load_page(page_num)
+    
+    # 1. Try to extract digital text first (LOW COST / FAST)
+    raw_pdf_text = page.get_text("text")
+    meaningful_text_length = len(raw_pdf_text.strip())
+    
+    # Optimization: If digital text is substantial, use it to save API cost.
+    if meaningful_text_length > 250:
+        print(f"📄 Page {page_num + 1}: Digital text found, skipping Gemini OCR.")
+        return _mark_page(page_num, raw_pdf_text.strip())
+    
+    # 2. Fallback: If digital text is sparse or missing, use Gemini Vision (HIGH COST)
+    print(f"🖼️ Page {page_num + 1}: Digital text sparse ({meaningful_text_length} chars). Falling back to Gemini Vision OCR...")
+    
+    # Convert page to a right-sized JPEG image
+    return _render_page_for_ocr(page)
 
-def process_document_to_cleaned_text(uploaded_file, api_key):
+def _iter_pdf_pages(doc, api_key, max_workers=OCR_MAX_WORKERS):
+    """
+    Yields each page's text with its '--- PAGE N ---' marker, in page order.
+    Scanned pages are grouped OCR_PAGES_PER_REQUEST to a Gemini call, and the
+    batches are OCR'd concurrently while later pages are read. PyMuPDF is not
+    thread-safe, so reading and rendering stay on this thread. The window of
+    pages in flight is bounded so rendered images don't pile up.
+    """
+    # Entries are finished page texts, or (slot, index) into a batch whose
+    # Future is stored in slot[0] once the batch is submitted.
+    pending = deque()
+    batch = []
+    slot = [None]
+    window = max_workers * OCR_PAGES_PER_REQUEST
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit_batch():
+            nonlocal batch, slot
+            slot[0] = executor.submit(_ocr_page_batch, batch, api_key)
+            batch, slot = [], [None]
+
+        def resolve(entry):
+            if isinstance(entry, str):
+                return entry
+            entry_slot, index = entry
+            if entry_slot[0] is None:
+                # Its batch is still being filled: send it as it is
+                submit_batch()
+            return entry_slot[0].result()[index]
+
+        for page_num in range(doc.page_count):
+            if len(pending) >= window:
+                yield resolve(pending.popleft())
+
+            page = _read_page(doc, page_num)
+            if page is None:
+                # Blank page: keep its marker, but don't spend an OCR request on it
+                print(f"⬜ Page {page_num + 1}: Blank, skipping Gemini OCR.")
+                pending.append(_mark_page(page_num, ""))
+                continue
+            if isinstance(page, str):
+                pending.append(page)
+                continue
+
+            # Send image to Gemini Vision for comprehensive text extraction
+            pending.append((slot, len(batch)))
+            batch.append((page_num, page))
+            if len(batch) == OCR_PAGES_PER_REQUEST:
+                submit_batch()
+
+        if batch:
+            submit_batch()
+        while pending:
+            yield resolve(pending.popleft())
+
+def process_document_to_cleaned_text(uploaded_file, api_key, max_concurrency=OCR_MAX_WORKERS):
     """
     Processes an uploaded file (PDF/Image) to extract raw text, 
     then uses Gemini to clean and structure it.
+    Up to `max_concurrency` scanned pages are OCR'd at once; all Gemini calls
+    together stay under GEMINI_MAX_IN_FLIGHT.
+    Each chunk of pages is sent for structuring as soon as it is extracted,
+    so Gemini cleans the early chunks while later pages are still being OCR'd.
     """
-    raw_text = None
+    try:
+        client = _get_genai_client(api_key)
+    except ValueError as e:
+        return None, str(e)
+
+    doc = None
     
     if uploaded_file.type == "application/pdf":
-        pdf_bytes = uploaded_file.getvalue()
-        
-        if fitz:
-            try:
-                doc = fitz.open(stream=pdf_bytes)
-                
-                # **********************************************
-                # CASE 1: TEST ONLY - Single Page Processing
-                # **********************************************
-                # Uncomment the block below (remove the triple quotes) 
-                # to process ONLY the first page for fast, low-token testing.
-                # **********************************************
-                '''
-                page_num = 0 # Only process the first page (index 0)
-                page = doc.load_page(page_num)
-                
-                # Convert page to a high-resolution PNG image
-                pix = page.get_pixmap(dpi=300)
-                img_bytes = pix.tobytes("png")
-                
-                # Send image to Gemini Vision for comprehensive text extraction
-                page_text, error = extract_text_gemini(img_bytes, api_key)
-                
-                if error:
-                    page_text = f"[ERROR: Could not extract page 1]. {error}"
-                    
-                raw_text = f"\n\n--- PAGE 1 ---\n\n{page_text}"
-                print(f"📄 Testing mode: Only Page 1 extracted.")
-                '''
-                # Ensure you comment out the full scanning block (CASE 2) if using this!
-                
-                
-                # **********************************************
-                # CASE 2: FINAL SUBMISSION - Whole PDF with Optimization
-                # **********************************************
-                # Use this block for the final submission. It includes the token-saving logic.
-                # **********************************************
+        if not fitz:
+            return None, "PyMuPDF (fitz) library is missing, cannot process PDF."
+
+        try:
+            # getvalue() hands over the upload's own bytes object (BytesIO
+            # shares it rather than copying), and MuPDF reads it in place.
+            doc = fitz.open(stream=uploaded_file.getvalue(), filetype="pdf")
+        except Exception as e:
+            return None, f"PDF Processing Error: {e}"
                 
-                raw_text_parts = []
-                for page_num in range(doc.page_count):
-                    page = doc.load_page(page_num)
-                    page_text = ""
-                    
-                    # 1. Try to extract digital text first (LOW COST / FAST)
-                    raw_pdf_text = page.get_text()
-                    meaningful_text_length = len(raw_pdf_text.strip())
-                    
-                    # Optimization: If digital text is substantial, use it to save API cost.
-                    if meaningful_text_length > 250:
-                        page_text = raw_pdf_text.strip()
-                        print(f"📄 Page {page_num + 1}: Digital text found, skipping Gemini OCR.")
-                    
-                    # 2. Fallback: If digital text is sparse or missing, use Gemini Vision (HIGH COST)
-                    else:
-                        print(f"🖼️ Page {page_num + 1}: Digital text sparse ({meaningful_text_length} chars). Falling back to Gemini Vision OCR...")
-                        
-                        # Convert page to high-resolution PNG image
-                        pix = page.get_pixmap(dpi=300)
-                        img_bytes = pix.tobytes("png")
-                        
-                        # Send image to Gemini Vision for comprehensive text extraction
-                        page_text, error = extract_text_gemini(img_bytes, api_key)
-                        
-                        if error:
-                            print(f"Warning: Failed to process page {page_num+1}. Error: {error}")
-                            page_text = f"[ERROR: Could not extract page {page_num+1}]" 
-                        
-                    raw_text_parts.append(f"\n\n--- PAGE {page_num + 1} ---\n\n{page_text}")
-                    
-                raw_text = "".join(raw_text_parts) # Combine all page text
+        # **********************************************
+        # CASE 1: TEST ONLY - Single Page Processing
+        # **********************************************
+        # Uncomment the block below (remove the triple quotes) 
+        # to process ONLY the first page for fast, low-token testing.
+        # **********************************************
+        '''
+        page_num = 0 # Only process the first page (index 0)
+        page = doc.load_page(page_num)
+        
+        # Convert page to a high-resolution PNG image
+        pix = page.get_pixmap(dpi=300)
+        img_bytes = pix.tobytes("png")
+        
+        # Send image to Gemini Vision for comprehensive text extraction
+        page_text, error = extract_text_gemini(img_bytes, api_key)
+        
+        if error:
+            page_text = f"[ERROR: Could not extract page 1]. {error}"
             
-                
-                # Ensure you comment out the single-page block (CASE 1) if using this!
-                
-                doc.close()
-                
-                if not raw_text.strip():
-                     return None, "PDF processed successfully but returned empty content."
-                
-            except Exception as e:
-                return None, f"PDF Processing Error: {e}"
-        else:
-            return None, "PyMuPDF (fitz) library is missing, cannot process PDF."
+        chunks = [("", f"\n\n--- PAGE 1 ---\n\n{page_text}")]
+        print(f"📄 Testing mode: Only Page 1 extracted.")
+        '''
+        # Ensure you comment out the full scanning block (CASE 2) if using this!
+        
+        
+        # **********************************************
+        # CASE 2: FINAL SUBMISSION - Whole PDF with Optimization
+        # **********************************************
+        # Use this block for the final submission. It includes the token-saving logic.
+        # **********************************************
+        
+        # Lazy: pages are extracted as the chunks are consumed below
+        chunks = _pack_pages(_iter_pdf_pages(doc, api_key, max_concurrency))
+        
+        # Ensure you comment out the single-page block (CASE 1) if using this!
             
     else: # Image file (standard image processing)
+        # One Gemini call reads the image and emits the slides directly
         img_bytes = uploaded_file.getvalue()
-        raw_text, error = extract_text_gemini(img_bytes, api_key)
-        if error:
-            return None, f"Extraction Error (Image): {error}"
-
-    # Check if raw text was successfully extracted before proceeding to cleaning
-    if not raw_text:
-        return None, "Raw text extraction failed or returned empty content."
-
-    # Step 2: Use Gemini to clean and structure the extracted raw text
-    clean_prompt = (
-        "The following text was extracted from a document. "
-        "Review the text and generate a structured, clean JSON list suitable for a presentation. "
-        "The JSON MUST follow this exact schema: "
-        "[{'title': 'Slide Title 1', 'content': ['Point 1', 'Point 2', '...', 'Point N']}, "
-        "{'title': 'Slide Title 2', 'content': ['Point 1', 'Point 2', '...']}, ...]. "
-        "Infer logical slide breaks from the content (e.g., section headings, major topic changes). "
-        "Use simple bullet points in the 'content' lists. Do not use Markdown formatting in the lists."
-        f"\n\nRAW TEXT:\n---\n{raw_text}\n---"
-    )
-    
-    # ... (rest of the function for API calls remains the same)
-    
+        try:
+            slides = _structure_image(client, img_bytes, uploaded_file.type)
+        except Exception as e:
+            return None, f"Extraction Error (Image): {e}"
+
+        # Check if any slides were produced
+        if not slides:
+            return None, "Image processed successfully but returned empty content."
+
+        return json.dumps(slides), None
+
+    # Step 2: Use Gemini to clean and structure the extracted raw text,
+    # one structured JSON call per chunk, run concurrently with extraction
+    executor = _get_clean_executor()
+    # Appended one by one so a failure partway through extraction can still
+    # cancel the chunks already queued on the shared pool
+    futures = []
     try:
-        client = _get_genai_client(api_key)
-    except ValueError as e:
-        return None, str(e)
-        
-    # --- Structured JSON generation call ---
+        for context, chunk in chunks:
+            futures.append(executor.submit(_structure_chunk, client, context, chunk))
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        return None, f"PDF Processing Error: {e}"
+    finally:
+        if doc is not None:
+            doc.close()
+
+    if not futures:
+        return None, "PDF processed successfully but returned empty content."
+
     try:
-        response = _retry_api_call(
-            client.models.generate_content,
-            model="gemini-flash-latest",
-            contents=clean_prompt,
-            config=GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema={
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "The title of the presentation slide."},
-                            "content": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "A list of bullet points for the slide content."
-                            }
-                        },
-                        "required": ["title", "content"]
-                    }
-                }
-            )
-        )
-        return response.text, None
-        
+        slides = [slide for future in futures for slide in future.result()]
     except Exception as e:
+        # The pool is shared: don't leave this document's queued chunks behind
+        for future in futures:
+            future.cancel()
         return None, f"Gemini API call failed during structuring/cleaning: {e}"
+
+    return json.dumps(slides), None
 # --------------------------------
 # 3. STRUCTURE MANIPULATION FUNCTIONS
 # --------------------------------
@@ -267,14 +704,31 @@ def generate_initial_structure(input_text, system_instruction, api_key):
     """
 
     # If input_text is very short, assume it's a topic
-    if len(input_text.split()) < 10:
+    is_topic = len(input_text.split()) < 10
+    if is_topic:
+        # Outlines for a one-line topic are cheap to produce: use the lite
+        # model, and reuse a recent answer for the same topic and instruction.
+        topic_key = (SLIDES_SCHEMA_VERSION, input_text.strip().lower(), system_instruction)
+        with _topic_cache_lock:
+            cached = _topic_cache.get(topic_key)
+        if cached and time.monotonic() - cached[0] < TOPIC_CACHE_TTL:
+            print("🗂️ Reusing cached outline for this topic.")
+            return cached[1], None
+
+        model = TOPIC_MODEL_NAME
+        prompt_head = ""
         prompt_content = f"on the topic: '{input_text}'. "
     else:
-        # Otherwise assume it is full cleaned text
-        prompt_content = f"based on the following content:\n\n{input_text}\n\n"
+        model = "gemini-flash-latest"
+        # Otherwise assume it is full cleaned text. It goes first: Gemini's
+        # implicit cache matches on prompt prefixes, so regenerating the
+        # outline with a different instruction reuses the document's tokens.
+        prompt_head = f"CONTENT:\n\n{input_text}\n\n---\n\n"
+        prompt_content = "based on the content above. "
 
     # Build the prompt
     prompt = (
+        f"{prompt_head}"
         f"{system_instruction}\n\n"
         f"Create a structured JSON outline for a presentation {prompt_content}"
         "The JSON must follow this strictly:\n"
@@ -295,31 +749,21 @@ def generate_initial_structure(input_text, system_instruction, api_key):
     try:
         response = _retry_api_call(
             client.models.generate_content,
-            model="gemini-flash-latest",
+            model=model,
             contents=prompt,
-            config=GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema={
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "The title of the presentation slide."},
-                            "content": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "A list of bullet points for the slide content."
-                            }
-                        },
-                        "required": ["title", "content"]
-                    }
-                }
-            )
+            config=SLIDES_CONFIG
         )
-        return response.text, None
     except Exception as e:
         return None, f"Gemini API call failed during structure generation: {e}"
 
+    if is_topic:
+        with _topic_cache_lock:
+            _topic_cache.pop(topic_key, None)
+            if len(_topic_cache) >= TOPIC_CACHE_MAX_ENTRIES:
+                _topic_cache.pop(next(iter(_topic_cache)))
+            _topic_cache[topic_key] = (time.monotonic(), response.text)
+    return response.text, None
+
 def update_structure(api_key, existing_json, user_prompt):
     """Updates the existing JSON structure based on a user prompt."""
     
@@ -342,24 +786,7 @@ def update_structure(api_key, existing_json, user_prompt):
             client.models.generate_content,
             model="gemini-flash-latest",
             contents=prompt,
-            config=GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema={
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "title": {"type": "string", "description": "The title of the presentation slide."},
-                            "content": {
-                                "type": "array",
-                                "items": {"type": "string"},
-                                "description": "A list of bullet points for the slide content."
-                            }
-                        },
-                        "required": ["title", "content"]
-                    }
-                }
-            )
+            config=SLIDES_CONFIG
         )
         return response.text, None
     except Exception as e:
@@ -383,28 +810,56 @@ def create_docx(slides_data):
         return None, "The 'python-docx' library is not installed."
         
     try:
-        data = json.loads(slides_data)
-    except:
-        return None, "Failed to parse blueprint data for DOCX. Check the JSON format."
+        data = load_slides(slides_data)
+    except (ValueError, TypeError) as e:
+        return None, f"Failed to parse blueprint data for DOCX. Check the JSON format. ({e})"
         
     doc = Document()
+    body = doc.element.body
+
+    # Each kind of paragraph is created once through python-docx (which
+    # resolves its style) and then cloned at the XML level for every use,
+    # instead of paying the full add_paragraph/add_heading path per bullet.
+    def _template(p):
+        body.remove(p._p)
+        return p._p
+
+    templates = {
+        "h1": _template(doc.add_heading("", level=1)),
+        "h2": _template(doc.add_heading("", level=2)),
+        "bullet": _template(doc.add_paragraph(style='List Bullet')),
+    }
+    page_break = _template(doc.add_page_break())
+
+    def _paragraph(kind, text):
+        p = copy.deepcopy(templates[kind])
+        r = OxmlElement('w:r')
+        # Same setter as Run.text: '\n' and '\t' become <w:br/> and <w:tab/>,
+        # so multi-line points (tables, charts) keep their line breaks
+        r.text = text
+        p.append(r)
+        return p
+
+    paragraphs = []
+    last = len(data) - 1
 
     for i, entry in enumerate(data):
         title = entry.get('title', f"Slide {i+1}")
         content = entry.get('content', [])
 
         # Title/Heading
-        if i == 0:
-            doc.add_heading(title, level=1)
-        else:
-            doc.add_heading(title, level=2)
+        paragraphs.append(_paragraph("h1" if i == 0 else "h2", title))
 
         # Content bullets
-        for point in content:
-            doc.add_paragraph(point, style='List Bullet') 
+        paragraphs.extend(_paragraph("bullet", point) for point in content)
 
-        if i < len(data) - 1:
-            doc.add_page_break()
+        if i < last:
+            paragraphs.append(copy.deepcopy(page_break))
+
+    # Insert everything in one go, ahead of the section properties
+    sect_pr = body.sectPr
+    at = body.index(sect_pr) if sect_pr is not None else len(body)
+    body[at:at] = paragraphs
 
     # Save to a BytesIO buffer
     doc_stream = io.BytesIO()
@@ -415,21 +870,20 @@ def create_docx(slides_data):
 def create_markdown_report(slides_data):
     """Generates a detailed Markdown report from the JSON structure."""
     try:
-        data = json.loads(slides_data)
-    except:
-        return None, "Failed to parse blueprint data for Markdown. Check the JSON format."
+        data = load_slides(slides_data)
+    except (ValueError, TypeError) as e:
+        return None, f"Failed to parse blueprint data for Markdown. Check the JSON format. ({e})"
 
-    markdown = "# Presentation Content Report\n\n"
+    # Collected in a list and joined once; += in the loop is quadratic
+    parts = ["# Presentation Content Report\n\n"]
     
     for i, entry in enumerate(data):
         title = entry.get('title', f"Slide {i+1}")
         content = entry.get('content', [])
 
-        markdown += f"## {title}\n"
-        if content:
-            for point in content:
-                # Use standard markdown bullet points
-                markdown += f"- {point}\n"
-        markdown += "\n"
+        parts.append(f"## {title}\n")
+        # Use standard markdown bullet points
+        parts.extend(f"- {point}\n" for point in content)
+        parts.append("\n")
 
-    return markdown, None
\ No newline at end of file
+    return "".join(parts), None
\ No newline at end of file
@@ -2,8 +2,9 @@ import os
 import io
 import re
 import time
-import json
 import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
 import fitz  # PyMuPDF
@@ -12,29 +13,55 @@ from pptx.dml.color import RGBColor  # REQUIRED for coloring image prompts
 from docx import Document
 from pptx import Presentation
 from pptx.util import Inches, Pt
-from pptx.enum.text import MSO_ANCHOR, MSO_AUTO_SIZE
 
 # Import the necessary Google GenAI libraries
 from google.genai import Client
-from google.genai.types import Image, GenerateContentConfig, Part
+from google.genai.types import GenerateContentConfig, Part
 from google.api_core import exceptions
+from gemini_rate import wait_for_slot, record_rate_limited, record_success
+from result_cache import cache_key, cache_get, cache_put
 
 # --- Configuration Constants ---
 client = Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 MODEL_NAME = "models/gemini-flash-latest"
 OCR_MODEL_NAME = "models/gemini-flash-latest"
+# Concurrent Gemini OCR requests per document
+OCR_MAX_WORKERS = 8
+# Concurrent chunk-cleaning requests; gemini_rate paces all of them
+CLEAN_MAX_WORKERS = 4
+# Backoff on a 429 that carries no server-suggested delay
+RATE_LIMIT_BASE_DELAY = 5
+# Sparse pages OCR'd together in one Gemini request
+OCR_PAGES_PER_BATCH = 6
+OCR_PROMPT = ("Extract ALL text accurately. Preserve formatting, steps, bullet points, equations, "
+    "indentation, tables, and line breaks. Do NOT summarize. Return ONLY the raw text.")
+# Batched answers mark where each page's text starts
+_PAGE_SEPARATOR_RE = re.compile(r'^=== PAGE (\d+) ===[ \t]*$', re.M)
+# JPEG is several times smaller than PNG for rendered pages, with no OCR-relevant loss
+OCR_JPEG_QUALITY = 85
 
 # ----------------------------------------------------------------------
 # 1. PDF/Image Extraction 
 # ----------------------------------------------------------------------
 
-def extract_text_from_pdf(pdf_bytes, dpi=200):
+def _is_full_page_scan(page):
+    """True when a single image covers most of the page, i.e. the page is a scan."""
+    page_area = page.rect.get_area()
+    return any(
+        kind == "fill-image" and fitz.Rect(bbox).get_area() >= 0.9 * page_area
+        for kind, bbox in page.get_bboxlog()
+    )
+
+def extract_text_from_pdf(pdf_bytes, dpi=150, dpi_scan=200):
     """
     Extracts text from PDF pages, and renders pages as images for OCR if text is sparse.
-    Returns a list of tuples: [(page_number, extracted_text, base64_image)]
+    Yields one tuple per page: (page_number, extracted_text, image_bytes)
+    Pages are produced lazily so only the pages currently in flight are held in memory.
     
-    Ensures iteration over ALL pages and saves images (PNG) for pages with sparse digital text.
+    Ensures iteration over ALL pages and saves images (JPEG) for pages with sparse digital text.
+    Sparse pages render at `dpi`; full-page scans, whose text is already
+    degraded by the scanner, get `dpi_scan` instead.
     """
     
     # Check for PyMuPDF
@@ -43,30 +70,26 @@ def extract_text_from_pdf(pdf_bytes, dpi=200):
 
     # Convert bytes to a PyMuPDF document
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    results = []
     num_pages = len(doc)
     
     print(f"✅ Opened PDF | Total pages: {num_pages}")
 
+    # Use matrix=fitz.Matrix(dpi/72, dpi/72) for consistent DPI across platforms
+    matrix = fitz.Matrix(dpi/72, dpi/72)
+    scan_matrix = fitz.Matrix(dpi_scan/72, dpi_scan/72)
+
     try:
         # Iterate over all pages detected by PyMuPDF to ensure all pages are processed.
-        for i, page in enumerate(doc):
+        # Pages are loaded one at a time and released below, so only the
+        # current page is ever held instead of every page visited so far.
+        for i in range(num_pages):
+            page = doc.load_page(i)
             page_num = i + 1
             
             # 1. Attempt to extract text directly from the PDF
             raw_pdf_text = page.get_text()
             
-            # 2. Render the page to an image (in memory)
-            # Use matrix=fitz.Matrix(dpi/72, dpi/72) for consistent DPI across platforms
-            matrix = fitz.Matrix(dpi/72, dpi/72)
-            pix = page.get_pixmap(matrix=matrix, alpha=False)
-            
-            # Convert pixmap to image bytes (PNG is lossless and safe for OCR)
-            # We must use 'png' mimeType later if we use this format.
-            img_data = pix.tobytes(output="png") 
-            base64_img = base64.b64encode(img_data).decode('utf-8')
-            
-            # 3. Decide which data structure to save
+            # 2. Decide which data structure to save
             
             # Threshold Check: If digital text has a decent amount of content, use it directly.
             # Strips whitespace and normalizes it to count meaningful characters.
@@ -75,18 +98,29 @@ def extract_text_from_pdf(pdf_bytes, dpi=200):
             # Threshold: If meaningful text > 250 characters, assume digital text is sufficient.
             if meaningful_text_length > 250:
                 print(f"📄 Page {page_num}: Digital text found, skipping image OCR. Content Length: {meaningful_text_length}")
-                # Use raw_pdf_text and set base64_img to None (to avoid unnecessary OCR)
-                results.append((page_num, raw_pdf_text.strip(), None)) 
+                # Use raw_pdf_text and set the image to None (to avoid unnecessary OCR)
+                page = None
+                yield (page_num, raw_pdf_text.strip(), None)
             else:
                 print(f"🖼️ Page {page_num}: Sparse text found. Image saved for OCR. Content Length: {meaningful_text_length}")
-                # Use None for text and keep base64_img for OCR
-                results.append((page_num, None, base64_img)) 
+                # 3. Render the page to an image (in memory). Only pages going to
+                # OCR are rasterized at all; digital pages never pay for it.
+                # One gray channel: a third of the pixels to render, encode and upload,
+                # and all the OCR and the classifier look at anyway.
+                page_matrix = scan_matrix if _is_full_page_scan(page) else matrix
+                pix = page.get_pixmap(matrix=page_matrix, colorspace=fitz.csGRAY, alpha=False)
+                # We must use 'jpeg' mimeType later if we use this format.
+                # Raw bytes go straight to Part.from_bytes: no base64 round-trip
+                img_data = pix.tobytes(output="jpeg", jpg_quality=OCR_JPEG_QUALITY)
+                # Free the raw samples now rather than keeping them alive while the generator is suspended
+                pix = None
+                page = None
+                # Use None for text and keep img_data for OCR
+                yield (page_num, None, img_data)
 
     finally:
         # Crucial: Close the document to release resources
         doc.close()
-        
-    return results
 
 # ----------------------------------------------------------------------
 # 2. OCR Classification
@@ -103,19 +137,17 @@ def is_image_digital(img_bytes):
         return False
 
     try:
-        # Convert bytes to a numpy array for OpenCV
+        # Convert bytes to a numpy array for OpenCV, decoding straight to gray
         nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        gray = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
 
-        if img is None:
+        if gray is None:
             print("[⚠️] Could not decode image bytes.")
             return False
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
         # 1️⃣ Quick check: edge density 
         edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
+        edge_density = cv2.countNonZero(edges) / edges.size
 
         # Simple thresholding: high edge density (e.g., > 0.01) suggests sharp, printed text
         is_digital = edge_density > 0.01
@@ -142,55 +174,148 @@ def extract_text_tesseract(img_bytes, timeout=10, max_retries=2):
     print("⚠️ Tesseract (local OCR) is generally not supported in cloud environments like Streamlit. Bypassing and relying on Gemini.")
     return "" 
 
-def extract_text_gemini(data, api_key, is_base64=True, max_retries=5):
+def _is_rate_limited(error):
+    """True for a 429, whether raised by google-api-core or by google-genai (.code)."""
+    return isinstance(error, exceptions.ResourceExhausted) or getattr(error, "code", None) == 429
+
+def _retry_delay_seconds(error, fallback):
+    """
+    The delay the server asked for on a 429 (RetryInfo's retry_delay or the
+    Retry-After header), or `fallback` when it gave none.
+    """
+    retry_delay = getattr(error, "retry_delay", None)
+    if retry_delay is not None:
+        # A timedelta from RetryInfo, or plain seconds
+        return retry_delay.total_seconds() if hasattr(retry_delay, "total_seconds") else float(retry_delay)
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else fallback
+    except (TypeError, ValueError):
+        return fallback
+
+def extract_text_gemini(data, api_key, is_base64=True, max_retries=5, use_cache=True):
     """
     Gemini OCR with built-in Retry Logic for 429 errors.
+    Results are cached by image hash, so re-processed pages skip the API call.
     """
-    prompt = ("Extract ALL text accurately. Preserve formatting, steps, bullet points, equations, "
-        "indentation, tables, and line breaks. Do NOT summarize. Return ONLY the raw text.")
+    prompt = OCR_PROMPT
     img_data = base64.b64decode(data) if is_base64 else data
-    img_part = Part.from_bytes(data=img_data, mime_type='image/png')
+
+    key = cache_key(img_data, OCR_MODEL_NAME, prompt) if use_cache else None
+    if key is not None:
+        cached = cache_get(key)
+        if cached is not None:
+            return cached
+
+    img_part = Part.from_bytes(data=img_data, mime_type='image/jpeg')
 
     config = GenerateContentConfig(temperature=0, max_output_tokens=8192)
 
-    delay = 5  # Initial wait time in seconds
+    delay = RATE_LIMIT_BASE_DELAY  # Used only when the server suggests no delay
     for attempt in range(max_retries):
         try:
             print(f"✨ Gemini OCR attempt {attempt + 1}/{max_retries}")
+            # Shared pacing across all OCR workers replaces a fixed sleep per page
+            wait_for_slot()
             response = client.models.generate_content(
                 model=OCR_MODEL_NAME,
                 config=config,
                 contents=[img_part, prompt]
             )
-            return response.text.strip()
+            record_success()
+            text = response.text.strip()
+            if key is not None and text:
+                cache_put(key, text)
+            return text
 
-        except exceptions.ResourceExhausted as e:
+        except Exception as e:
+            if not _is_rate_limited(e):
+                print(f"❌ Other error: {e}")
+                break
             # This handles the 429 error specifically
+            record_rate_limited()
             if attempt < max_retries - 1:
-                print(f"⚠️ Rate limit hit. Waiting {delay} seconds before retry...")
-                time.sleep(delay)
+                wait = _retry_delay_seconds(e, delay)
+                print(f"⚠️ Rate limit hit. Waiting {wait:.1f} seconds before retry...")
+                time.sleep(wait)
                 delay *= 2  # Wait longer each time (5s, 10s, 20s...)
             else:
                 return f"[ERROR] Gemini OCR failed after {max_retries} attempts due to rate limiting."
-        except Exception as e:
-            print(f"❌ Other error: {e}")
-            break
             
     return ""
 
+def extract_text_gemini_batch(images, api_key, max_retries=5):
+    """
+    Gemini OCR for several raw page images in one request.
+    Returns one text per image, in order, or None if the answer can't be
+    split back into pages. Pages already in the cache are not re-sent.
+    """
+    keys = [cache_key(img_data, OCR_MODEL_NAME, OCR_PROMPT) for img_data in images]
+    texts = [cache_get(key) for key in keys]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if not missing:
+        return texts
+
+    prompt = (f"There are {len(missing)} page images above. {OCR_PROMPT} "
+        "Start each page's text with its own line '=== PAGE N ===', where N is the "
+        "page's position above (1, 2, 3, ...).")
+    contents = [Part.from_bytes(data=images[i], mime_type='image/jpeg') for i in missing] + [prompt]
+    config = GenerateContentConfig(temperature=0, max_output_tokens=min(8192 * len(missing), 65536))
+
+    delay = RATE_LIMIT_BASE_DELAY  # Used only when the server suggests no delay
+    for attempt in range(max_retries):
+        try:
+            print(f"✨ Gemini batch OCR ({len(missing)} pages) attempt {attempt + 1}/{max_retries}")
+            wait_for_slot()
+            response = client.models.generate_content(
+                model=OCR_MODEL_NAME,
+                config=config,
+                contents=contents
+            )
+            record_success()
+            break
+        except Exception as e:
+            if not _is_rate_limited(e):
+                print(f"❌ Batch OCR error: {e}")
+                return None
+            record_rate_limited()
+            if attempt == max_retries - 1:
+                return None
+            wait = _retry_delay_seconds(e, delay)
+            print(f"⚠️ Rate limit hit. Waiting {wait:.1f} seconds before retry...")
+            time.sleep(wait)
+            delay *= 2
+
+    # re.split keeps the captured page numbers: [preamble, "1", text1, "2", text2, ...]
+    pieces = _PAGE_SEPARATOR_RE.split(response.text or "")
+    pages = {int(n): text.strip() for n, text in zip(pieces[1::2], pieces[2::2])}
+    if sorted(pages) != list(range(1, len(missing) + 1)):
+        return None
+
+    for n, i in enumerate(missing, start=1):
+        texts[i] = pages[n]
+        if pages[n]:
+            cache_put(keys[i], pages[n])
+    return texts
+
 # ----------------------------------------------------------------------
 # 4. Text Cleaning and Structuring (CHUNKED VERSION)
 # ----------------------------------------------------------------------
 
+_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n+')
+_LINE_EDGE_SPACE_RE = re.compile(r'^[^\S\n]+|[^\S\n]+$', re.M)
+# First characters that mark a Markdown bullet line
+_BULLET_CHARS = ('*', '-', '•')
+
 def _clean_raw_text(text):
     """
     Helper function to clean raw OCR text.
     Removes excessive whitespace and normalizes line breaks.
     """
     # Remove excessive blank lines (more than 2 newlines in a row)
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    # Remove trailing/leading whitespace from each line
-    text = '\n'.join(line.strip() for line in text.split('\n'))
+    text = _BLANK_LINES_RE.sub('\n\n', text)
+    # Remove trailing/leading whitespace from each line, in one pass over the text
+    text = _LINE_EDGE_SPACE_RE.sub('', text)
     return text.strip()
 
 def chunk_pages(pages_list, chunk_size=5):
@@ -198,16 +323,10 @@ def chunk_pages(pages_list, chunk_size=5):
     for i in range(0, len(pages_list), chunk_size):
         yield pages_list[i:i + chunk_size]
 
-def clean_chunk_with_gemini(raw_text, api_key, part_no, total_parts):
-    """
-    Uses Gemini to clean a specific chunk with awareness of its position.
-    """
-    if not api_key:
-        return "[ERROR] API Key is missing."
-
-    # Context-aware prompt to maintain continuity
-    prompt = f"""
-You are a professional text cleaner. This is PART {part_no} of {total_parts} of a larger study document.
+# The fixed cleaning instructions go in the system instruction of one config
+# built at import; only the chunk's position and text change per request.
+CLEAN_INSTRUCTIONS = """
+You are a professional text cleaner. Each request is one PART of a larger study document.
 
 STRICT INSTRUCTIONS:
 - If this is NOT Part 1, skip the general introduction.
@@ -216,52 +335,123 @@ STRICT INSTRUCTIONS:
 - Maintain Markdown structure (# for topics, ## for sections).
 - Strategically insert [Image of X] tags for complex concepts that would benefit from visual aids (diagrams, charts, illustrations).
 
-OCR Text from Part {part_no}:
-{raw_text}
-
 Return ONLY the cleaned Markdown.
 """
+CLEAN_CONFIG = GenerateContentConfig(
+    temperature=0.2, max_output_tokens=8192, system_instruction=CLEAN_INSTRUCTIONS
+)
+
+def clean_chunk_with_gemini(raw_text, api_key, part_no, total_parts, max_retries=5):
+    """
+    Uses Gemini to clean a specific chunk with awareness of its position.
+    """
+    if not api_key:
+        return "[ERROR] API Key is missing."
+
+    # Context-aware prompt to maintain continuity
+    prompt = f"This is PART {part_no} of {total_parts}.\n\nOCR Text from Part {part_no}:\n{raw_text}"
     
-    gen_config = GenerateContentConfig(temperature=0.2, max_output_tokens=8192)
+    # The prompt holds the chunk text and its position, so it keys the cache
+    key = cache_key(CLEAN_INSTRUCTIONS, prompt, MODEL_NAME)
+    cached = cache_get(key)
+    if cached is not None:
+        return cached
 
-    try:
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=[prompt],
-            config=gen_config
-        )
-        return response.text.strip()
-    except Exception as e:
-        print(f"❌ Chunk {part_no} Cleaning Error: {e}")
-        return f"\n[Error cleaning Part {part_no}]\n"
+    delay = RATE_LIMIT_BASE_DELAY  # Used only when the server suggests no delay
+    for attempt in range(max_retries):
+        try:
+            wait_for_slot()
+            response = client.models.generate_content(
+                model=MODEL_NAME,
+                contents=[prompt],
+                config=CLEAN_CONFIG
+            )
+            record_success()
+            cleaned = response.text.strip()
+            if cleaned:
+                cache_put(key, cleaned)
+            return cleaned
+        except Exception as e:
+            if _is_rate_limited(e) and attempt < max_retries - 1:
+                record_rate_limited()
+                wait = _retry_delay_seconds(e, delay)
+                print(f"⚠️ Chunk {part_no} rate limited. Waiting {wait:.1f} seconds before retry...")
+                time.sleep(wait)
+                delay *= 2
+                continue
+            print(f"❌ Chunk {part_no} Cleaning Error: {e}")
+            return f"\n[Error cleaning Part {part_no}]\n"
 
 # ----------------------------------------------------------------------
 # 5. Core Pipeline Function (Scalable & Robust)
 # ----------------------------------------------------------------------
 
+def _ocr_page(page_num, digital_text, img_data, api_key):
+    """
+    Worker for a single page: returns its digital text, or falls back to Gemini OCR.
+    """
+    content = ""
+    if digital_text:
+        content = digital_text.strip()
+    elif img_data:
+        # Fallback to OCR
+        ocr_result = extract_text_gemini(img_data, api_key, is_base64=False)
+        content = ocr_result.strip()
+    return content
+
+def _ocr_page_group(pages, api_key):
+    """
+    Worker for a run of pages: digital pages keep their text, and the sparse
+    ones are OCR'd together in one batched Gemini call (page by page if the
+    batched answer can't be split back into pages).
+    """
+    texts = [digital_text.strip() if digital_text else "" for _, digital_text, _ in pages]
+    sparse = [i for i, (_, digital_text, img_data) in enumerate(pages) if not digital_text and img_data]
+
+    if len(sparse) > 1:
+        batch_texts = extract_text_gemini_batch([pages[i][2] for i in sparse], api_key)
+        if batch_texts is not None:
+            for i, text in zip(sparse, batch_texts):
+                texts[i] = text
+            return texts
+        print("⚠️ Batched OCR answer could not be split into pages. Retrying one page at a time.")
+
+    for i in sparse:
+        texts[i] = _ocr_page(*pages[i], api_key)
+    return texts
+
 def process_document_to_cleaned_text(pdf_file_bytes, api_key):
     """
     Handles PDF -> Page Extraction -> Chunking -> Parallelized-style Cleaning.
     """
     # 1. Extract raw content from every page
-    page_results = extract_text_from_pdf(pdf_file_bytes)
-    all_raw_pages = []
-    
-    print(f"Starting extraction for {len(page_results)} pages...")
-
-    for page_num, digital_text, base64_img in page_results:
-        content = ""
-        if digital_text:
-            content = digital_text.strip()
-        elif base64_img:
-            # Fallback to OCR
-            ocr_result = extract_text_gemini(base64_img, api_key)
-            content = ocr_result.strip()
-            # Pause briefly to respect rate limits for OCR calls
-            time.sleep(1) 
-        
-        if content:
-            all_raw_pages.append(content)
+    print("Starting extraction...")
+
+    # Gemini OCR calls are network-bound, so pages are OCR'd concurrently while
+    # the generator renders the next ones. Consecutive pages are grouped until
+    # a group holds OCR_PAGES_PER_BATCH images, which share one Gemini call.
+    # The window of in-flight groups is bounded so rendered images don't pile
+    # up ahead of the OCR workers.
+    page_texts = []
+    pending = deque()
+    group, group_images = [], 0
+    with ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS) as executor:
+        for page_result in extract_text_from_pdf(pdf_file_bytes):
+            group.append(page_result)
+            if page_result[2] is not None:
+                group_images += 1
+            if group_images < OCR_PAGES_PER_BATCH:
+                continue
+            if len(pending) >= 2 * OCR_MAX_WORKERS:
+                page_texts.extend(pending.popleft().result())
+            pending.append(executor.submit(_ocr_page_group, group, api_key))
+            group, group_images = [], 0
+        if group:
+            pending.append(executor.submit(_ocr_page_group, group, api_key))
+        for future in pending:
+            page_texts.extend(future.result())
+
+    all_raw_pages = [content for content in page_texts if content]
 
     if not all_raw_pages:
         return None, "[ERROR] No text could be extracted from this PDF."
@@ -270,22 +460,21 @@ def process_document_to_cleaned_text(pdf_file_bytes, api_key):
     PAGES_PER_CHUNK = 5
     page_chunks = list(chunk_pages(all_raw_pages, PAGES_PER_CHUNK))
     total_parts = len(page_chunks)
-    cleaned_chunks = []
 
     print(f"Processing {total_parts} chunks for cleaning...")
 
-    # 3. Clean each chunk sequentially
-    for idx, chunk in enumerate(page_chunks, start=1):
+    def _clean(idx, chunk):
         # Combine pages in this chunk
         chunk_raw_text = "\n\n---\n\n".join(chunk)
         chunk_raw_text = _clean_raw_text(chunk_raw_text)
 
         print(f"🧹 Cleaning chunk {idx}/{total_parts}...")
-        cleaned_text = clean_chunk_with_gemini(chunk_raw_text, api_key, idx, total_parts)
-        cleaned_chunks.append(cleaned_text)
+        return clean_chunk_with_gemini(chunk_raw_text, api_key, idx, total_parts)
 
-        # CRITICAL: Sleep between chunks to avoid 429 Rate Limit errors
-        time.sleep(4)
+    # 3. Clean the chunks concurrently. Rate limits are handled by the shared
+    # pacer and by honouring the server's retry delay, not by a fixed sleep.
+    with ThreadPoolExecutor(max_workers=CLEAN_MAX_WORKERS) as executor:
+        cleaned_chunks = list(executor.map(_clean, range(1, total_parts + 1), page_chunks))
 
     # 4. Merge all cleaned parts into the final document
     final_cleaned_text = "\n\n".join(cleaned_chunks)
@@ -296,6 +485,11 @@ def process_document_to_cleaned_text(pdf_file_bytes, api_key):
 # 6. Final Output Generation (Memory-based for Streamlit)
 # ----------------------------------------------------------------------
 
+# Compiled once for create_pptx_from_markdown; every other line check is a
+# plain string test on the first characters.
+_SLIDE_SPLIT_RE = re.compile(r'(?=\n#+\s)')
+_IMG_TAG_RE = re.compile(r'\[Image of (.+?)\]', re.IGNORECASE)
+
 def create_pptx_from_markdown(markdown_text):
     """
     Generates a PPTX file in memory from structured Markdown text.
@@ -308,7 +502,7 @@ def create_pptx_from_markdown(markdown_text):
 
     # Split slides by Markdown headings (# or ##)
     # Added \s to ensure it only splits on actual headers
-    slides_data = re.split(r'(?=\n#+\s)', markdown_text)
+    slides_data = _SLIDE_SPLIT_RE.split(markdown_text)
     slides_data = [s.strip() for s in slides_data if s.strip()]
 
     title_slide_layout = prs.slide_layouts[0] 
@@ -319,8 +513,7 @@ def create_pptx_from_markdown(markdown_text):
         title_line = lines[0].strip()
         
         # Clean the title (remove # symbols)
-        title_match = re.match(r'(#+)\s*(.*)', title_line)
-        title = title_match.group(2).strip() if title_match else title_line
+        title = title_line.lstrip('#').strip() if title_line.startswith('#') else title_line
         
         # Add slide
         slide = prs.slides.add_slide(title_slide_layout if i == 0 else content_slide_layout)
@@ -347,7 +540,7 @@ def create_pptx_from_markdown(markdown_text):
             
             # --- 1. HANDLE [Image of X] TAGS ---
             # This looks for: [Image of X] where X is any text
-            img_match = re.search(r'\[Image of (.+?)\]', line, re.IGNORECASE)
+            img_match = _IMG_TAG_RE.search(line) if '[' in line else None
             
             if img_match:
                 image_topic = img_match.group(1).strip()
@@ -357,10 +550,13 @@ def create_pptx_from_markdown(markdown_text):
                 continue
 
             # --- 2. HANDLE BULLETS AND FORMATTING ---
-            if re.match(r'^[\*•-]\s', line):
-                p.text = re.sub(r'^[\*•-]\s', '', line).strip()
+            # Classify the line once from its first two characters
+            c = line[:1]
+            is_bullet_char = c in _BULLET_CHARS
+            if is_bullet_char and line[1:2].isspace():
+                p.text = line[2:].strip()
                 p.level = 0
-            elif line.startswith('  ') or line.startswith('\t') or re.match(r'^[\*•-]{2,}', line):
+            elif line.startswith(('  ', '\t')) or (is_bullet_char and line[1:2] in _BULLET_CHARS):
                 p.text = line.lstrip('*•- \t').strip()
                 p.level = 1
             elif line.startswith('###'):
@@ -383,20 +579,21 @@ def create_docx_from_markdown(markdown_text):
     Generates a DOCX file in memory from structured Markdown text.
     """
     doc = Document()
+    # Resolve the bullet style once instead of by name for every bullet
+    bullet_style = doc.styles['List Bullet']
     
     for line in markdown_text.split('\n'):
         line = line.strip()
         if not line:
             continue
             
-        if line.startswith('###'):
-            doc.add_heading(line.lstrip('#').strip(), level=3)
-        elif line.startswith('##'):
-            doc.add_heading(line.lstrip('#').strip(), level=2)
-        elif line.startswith('#'):
-            doc.add_heading(line.lstrip('#').strip(), level=1)
-        elif line.startswith(('*', '-', '•')):
-            doc.add_paragraph(line.lstrip('*-• ').strip(), style='List Bullet')
+        # Classify the line once from its first character
+        c = line[:1]
+        if c == '#':
+            depth = len(line) - len(line.lstrip('#'))
+            doc.add_heading(line[depth:].strip(), level=min(depth, 3))
+        elif c in _BULLET_CHARS:
+            doc.add_paragraph(line.lstrip('*-• ').strip(), style=bullet_style)
         else:
             doc.add_paragraph(line)
             
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+# Gemini requests started per second, shared by every worker in the process.
+# Set GEMINI_MAX_RPS to match the API key's quota.
+GEMINI_MAX_RPS = float(os.getenv("GEMINI_MAX_RPS", "4"))
+# Each 429 stretches the spacing by this factor, up to MAX_INTERVAL seconds;
+# every success eases it back toward 1 / GEMINI_MAX_RPS.
+BACKOFF_FACTOR = 2.0
+RECOVERY_FACTOR = 0.9
+MAX_INTERVAL = 10.0
+
+_lock = threading.Lock()
+_base_interval = 1.0 / GEMINI_MAX_RPS
+_interval = _base_interval
+_next_slot = 0.0
+_rate_limited_count = 0
+
+
+def wait_for_slot():
+    """
+    Blocks until this caller's turn to send a request. Each caller reserves
+    the next free slot, so a fan-out of workers leaves the process spaced
+    out instead of hitting the per-second quota all in the same instant.
+    """
+    global _next_slot
+    with _lock:
+        now = time.monotonic()
+        slot = max(now, _next_slot)
+        _next_slot = slot + _interval
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def record_rate_limited():
+    """Called on a 429: widens the spacing between requests."""
+    global _interval, _rate_limited_count
+    with _lock:
+        _rate_limited_count += 1
+        _interval = min(MAX_INTERVAL, _interval * BACKOFF_FACTOR)
+        count, rate = _rate_limited_count, 1.0 / _interval
+    print(f"🚦 Gemini rate limit hit ({count} so far). Pacing calls at {rate:.2f}/s.")
+
+
+def record_success():
+    """Called after a successful request: eases the spacing back toward the configured rate."""
+    global _interval
+    with _lock:
+        _interval = max(_base_interval, _interval * RECOVERY_FACTOR)
@@ -1,13 +1,116 @@
 import os
+import shutil
+import tempfile
+
+# With tesserocr, each worker thread in process_folder runs its own Tesseract
+# engine, so OpenMP threads inside each engine would only fight the workers.
+# The single batched Tesseract process inherits it as well, where Tesseract's
+# OpenMP gains are small anyway. Must be set before cv2/tesserocr are loaded.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 import cv2
-from preprocess import preprocess_for_tesseract
-from ocr_engine import extract_text_tesseract, extract_text_gemini
+from concurrent.futures import ThreadPoolExecutor
+from preprocess import preprocess_for_tesseract, resize_for_ocr
+from ocr_engine import extract_text_tesseract, extract_text_tesseract_batch, extract_text_gemini
+from tesseract_api import get_tesseract_api
 from combine_texts import combine_texts_in_folder
 from classify_image_type import is_image_digital
 from gemini_processing import clean_with_gemini
 from ppt_formation import create_pptx_from_text
 from final_output_generator import export_all_outputs
 
+# libjpeg-turbo decodes the rendered JPEG pages 2-6x faster than cv2.imread
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY
+    _jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _jpeg = None
+
+# Pages are processed by this many threads at once (see process_folder);
+# OpenCV gets the cores left per worker instead of the whole machine each
+OCR_MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(1, (os.cpu_count() or 1) // OCR_MAX_WORKERS))
+
+
+def _read_gray(img_path):
+    """Decode an image file straight to a single gray channel (None if unreadable)."""
+    if _jpeg is not None and img_path.lower().endswith((".jpg", ".jpeg")):
+        try:
+            with open(img_path, "rb") as f:
+                return _jpeg.decode(f.read(), pixel_format=TJPF_GRAY)[:, :, 0]
+        except Exception:
+            pass  # Fall back to OpenCV below
+    return cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+
+
+def _save_text(text, img_path, sub_out_folder):
+    """Save extracted text next to the mirrored output path."""
+    fname = os.path.basename(img_path)
+
+    # Safety check
+    if not text.strip():
+        print(f"⚠️ OCR returned empty text for {fname}.")
+
+    txt_path = os.path.join(
+        sub_out_folder,
+        os.path.splitext(fname)[0] + ".txt"
+    )
+
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    print(f"✅ Saved extracted text → {txt_path}")
+    return txt_path
+
+
+def _process_image(img_path, sub_out_folder, batch_path):
+    """
+    Worker for a single image: classify it, then either
+    - handwritten: OCR with Gemini and save the text right away, or
+    - digital: preprocess, then OCR in place with tesserocr when it is
+      installed, or else write the result to `batch_path` for the single
+      batched Tesseract pass in process_folder.
+    Returns True when the image was queued for Tesseract.
+    """
+    fname = os.path.basename(img_path)
+    print(f"\n=============================================")
+    print(f"🖼️ Processing: {fname}")
+
+    # Pages are rendered gray upstream; decode straight to one channel.
+    img = _read_gray(img_path)
+    if img is None:
+        print(f"⚠️ Skipping unreadable file: {img_path}")
+        return False
+
+    os.makedirs(sub_out_folder, exist_ok=True)
+
+    try:
+        # STEP 1 — Detect type of text
+        if is_image_digital(img):
+            print(f"📘 {fname} detected as DIGITAL text.")
+
+            processed_img = preprocess_for_tesseract(resize_for_ocr(img))
+            if get_tesseract_api() is not None:
+                # tesserocr keeps one engine per thread, so OCR right here
+                _save_text(extract_text_tesseract(processed_img), img_path, sub_out_folder)
+                return False
+
+            cv2.imwrite(batch_path, processed_img)
+            return True
+
+        print(f"✍️ {fname} detected as HANDWRITTEN or MIXED text.")
+
+        # STEP 2 — Save extracted text
+        # The page is already decoded: send it from memory instead of re-reading the file
+        _save_text(extract_text_gemini(img), img_path, sub_out_folder)
+        return False
+
+    except Exception as e:
+        print(f"❌ ERROR processing {fname}: {e}")
+        return False
+
 
 def process_folder(input_folder, output_folder):
     """
@@ -15,6 +118,8 @@ def process_folder(input_folder, output_folder):
     - Detect handwritten vs digital
     - Run correct OCR engine
     - Save extracted text in structured output folders
+    Images are processed concurrently; Tesseract and Gemini both spend
+    their time outside the GIL.
     """
 
     if not os.path.exists(input_folder):
@@ -25,57 +130,43 @@ def process_folder(input_folder, output_folder):
     print(f"📂 Input: {input_folder}")
     print(f"📂 Output: {output_folder}")
 
+    img_paths = []
+    sub_out_folders = []
     for root, _, files in os.walk(input_folder):
+        # Create output folder mirror structure
+        relative_path = os.path.relpath(root, input_folder)
+        sub_out_folder = os.path.join(output_folder, relative_path)
+
         for fname in files:
 
-            # Process only images
-            if not fname.lower().endswith((".png", ".jpg", ".jpeg")):
+            # Pages with a text layer were extracted upstream: copy them through
+            if fname.lower().endswith(".txt"):
+                os.makedirs(sub_out_folder, exist_ok=True)
+                shutil.copy2(os.path.join(root, fname), sub_out_folder)
+                print(f"📄 {fname} already has extracted text, copied as-is.")
                 continue
 
-            img_path = os.path.join(root, fname)
-            print(f"\n=============================================")
-            print(f"🖼️ Processing: {fname}")
-
-            img = cv2.imread(img_path)
-            if img is None:
-                print(f"⚠️ Skipping unreadable file: {img_path}")
+            # Process only images
+            if not fname.lower().endswith((".png", ".jpg", ".jpeg")):
                 continue
 
-            # Create output folder mirror structure
-            relative_path = os.path.relpath(root, input_folder)
-            sub_out_folder = os.path.join(output_folder, relative_path)
-            os.makedirs(sub_out_folder, exist_ok=True)
-
-            try:
-                # STEP 1 — Detect type of text
-                if is_image_digital(img):
-                    print(f"📘 {fname} detected as DIGITAL text.")
-
-                    processed_img = preprocess_for_tesseract(img)
-                    text = extract_text_tesseract(processed_img)
-
-                else:
-                    print(f"✍️ {fname} detected as HANDWRITTEN or MIXED text.")
-
-                    text = extract_text_gemini(img_path)
-
-                # Safety check
-                if not text.strip():
-                    print("⚠️ OCR returned empty text.")
-
-                # STEP 2 — Save extracted text
-                txt_path = os.path.join(
-                    sub_out_folder,
-                    os.path.splitext(fname)[0] + ".txt"
-                )
-
-                with open(txt_path, "w", encoding="utf-8") as f:
-                    f.write(text)
-
-                print(f"✅ Saved extracted text → {txt_path}")
-
-            except Exception as e:
-                print(f"❌ ERROR processing {fname}: {e}")
+            img_paths.append(os.path.join(root, fname))
+            sub_out_folders.append(sub_out_folder)
+
+    with tempfile.TemporaryDirectory() as batch_dir:
+        batch_paths = [
+            os.path.join(batch_dir, f"page_{i}.png") for i in range(len(img_paths))
+        ]
+        with ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS) as executor:
+            queued = list(executor.map(_process_image, img_paths, sub_out_folders, batch_paths))
+
+        # Digital pages share one Tesseract process instead of one per page
+        digital = [i for i, is_queued in enumerate(queued) if is_queued]
+        if digital:
+            print(f"\n📘 Running Tesseract on {len(digital)} digital pages in one batch...")
+            texts = extract_text_tesseract_batch([batch_paths[i] for i in digital], batch_dir)
+            for i, text in zip(digital, texts):
+                _save_text(text, img_paths[i], sub_out_folders[i])
 
     print("\n🎯 All images processed successfully!")
 
@@ -4,12 +4,18 @@ import time
 import pytesseract
 import google.generativeai as genai # Standard SDK
 from PIL import Image # For multi-modal input
+from preprocess import resize_for_ocr
+from tesseract_api import TESSERACT_CONFIG, get_tesseract_api, set_gray_image
 
 
 # ------------------------------
 # 1️⃣ BETTER TESSERACT (Printed)
 # ------------------------------
 
+# Built once at import instead of on every call/retry
+# Hyphen goes last so it is a literal, not a range from backslash to whitespace
+_CLEAN_TEXT_RE = re.compile(r'[^A-Za-z0-9.,!?;:\'\"\\\s-]')
+
 def extract_text_tesseract(image, timeout=10, max_retries=2):
     """
     Improved Tesseract OCR for printed/digital text.
@@ -19,15 +25,22 @@ def extract_text_tesseract(image, timeout=10, max_retries=2):
         try:
             start = time.time()
 
-            config = r"--psm 6 --oem 3"
-            text = pytesseract.image_to_string(image, config=config)
+            api = get_tesseract_api()
+            if hasattr(image, "shape"):
+                image = resize_for_ocr(image)
+            if api is not None and getattr(image, "ndim", 0) == 2:
+                # Persistent libtesseract instance: no process spawn or model reload
+                set_gray_image(api, image)
+                text = api.GetUTF8Text()
+            else:
+                text = pytesseract.image_to_string(image, config=TESSERACT_CONFIG)
 
             if time.time() - start > timeout:
                 raise TimeoutError("Tesseract timeout")
 
             # Clean text
             # NOTE: The original regex was very aggressive. Reverting to basic clean-up for demonstration.
-            clean_text = re.sub(r'[^A-Za-z0-9.,!?;:\'\"\\-\s]', '', text)
+            clean_text = _CLEAN_TEXT_RE.sub('', text)
 
             print("🔍 Tesseract text extraction successful!")
             return clean_text.strip()
@@ -42,21 +55,56 @@ def extract_text_tesseract(image, timeout=10, max_retries=2):
                 return ""
 
 
+def extract_text_tesseract_batch(image_paths, list_dir, timeout=0):
+    """
+    OCRs many image files with a single Tesseract process.
+    Writes the paths to a list file in `list_dir` and hands that to Tesseract,
+    so the language model is loaded once for the whole batch instead of once
+    per page. Returns one cleaned string per input path, in order.
+    """
+    if not image_paths:
+        return []
+
+    list_path = os.path.join(list_dir, "images.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(image_paths) + "\n")
+
+    try:
+        text = pytesseract.image_to_string(list_path, config=TESSERACT_CONFIG, timeout=timeout)
+    except Exception as e:
+        print("❌ Tesseract batch OCR failed:", e)
+        return [""] * len(image_paths)
+
+    # Tesseract ends every page with a form feed
+    pages = text.split("\x0c")[:len(image_paths)]
+    pages += [""] * (len(image_paths) - len(pages))
+
+    print(f"🔍 Tesseract batch extraction successful for {len(image_paths)} pages!")
+    return [_CLEAN_TEXT_RE.sub('', page).strip() for page in pages]
+
+
 # ------------------------------------
 # 2️⃣ GEMINI VISION OCR (Handwritten/Complex)
 # ------------------------------------
-def extract_text_gemini(image_path, max_retries=3):
+def extract_text_gemini(image, max_retries=3):
     """
     Uses the Gemini API to perform robust OCR on complex or handwritten documents.
     Relies on genai.configure() being called prior to execution (e.g., in ui.py).
+    `image` may be a file path, encoded PNG bytes, or an already-decoded
+    array; bytes and arrays are sent from memory without touching disk.
     """
     model_name = "gemini-flash-latest" # Use the latest multi-modal model
     
     # 1. Load image using PIL
     try:
-        img = Image.open(image_path)
+        if isinstance(image, bytes):
+            img = {"mime_type": "image/png", "data": image}
+        elif hasattr(image, "shape"):
+            img = Image.fromarray(image)
+        else:
+            img = Image.open(image)
     except Exception as e:
-        print(f"⚠️ Could not load image {image_path} for Gemini OCR: {e}")
+        print(f"⚠️ Could not load image for Gemini OCR: {e}")
         return ""
 
     # 2. Define the contents and prompt
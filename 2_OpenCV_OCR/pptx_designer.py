@@ -1,4 +1,3 @@
-import json
 import io
 import re
 from pptx import Presentation
@@ -8,6 +7,7 @@ from pptx.enum.text import MSO_ANCHOR
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.enum.chart import XL_CHART_TYPE
 from pptx.chart.data import ChartData
+from slides_json import load_slides
 
 # --- THEME CONFIGURATION ---
 # Defines the look and feel for the 3 default options
@@ -69,6 +69,24 @@ def _apply_theme_style(run, level, theme_cfg):
     r, g, b = theme_cfg["body_color"]
     font.color.rgb = RGBColor(r, g, b)
 
+def _parse_bullet(point):
+    """Returns (level, text) for a Markdown-like '*', '**' or '***' bullet."""
+    processed_point = point.strip()
+    if processed_point.startswith('***'):
+        return 2, processed_point.lstrip('***').strip()
+    if processed_point.startswith('**'):
+        return 1, processed_point.lstrip('**').strip()
+    if processed_point.startswith('*'):
+        return 0, processed_point.lstrip('*').strip()
+    return 0, processed_point
+
+def _get_layout(prs, layout_index):
+    """Looks up a slide layout, falling back to the Title Slide layout (index 0 is always safe)."""
+    try:
+        return prs.slide_layouts[layout_index]
+    except IndexError:
+        return prs.slide_layouts[0]
+
 def _add_design_element(slide, theme_cfg):
     """Adds the visual 'bold' design element (shape) to the slide."""
     if not theme_cfg.get("design_element", False):
@@ -181,9 +199,9 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
     ... (Docstring content truncated for brevity)
     """
     try:
-        data = json.loads(slides_data)
-    except:
-        return None, "Failed to parse JSON blueprint."
+        data = load_slides(slides_data)
+    except (ValueError, TypeError) as e:
+        return None, f"Failed to parse JSON blueprint. ({e})"
 
     # --- 1. Load Presentation Object and Theme Configuration (UPDATED) ---
     if template_data:
@@ -212,15 +230,25 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
         prs = Presentation() 
         initial_slide_count = 0 # No pre-existing slides
         theme_cfg = THEMES.get(theme_name, THEMES[DEFAULT_THEME])
+        # Resolved once instead of per slide
+        content_layout = _get_layout(prs, 1)
+        title_only_layout = _get_layout(prs, 5)
 
     # --- 2. Iterate and Build Slides (UPDATED LOOP LOGIC) ---
     for i, slide_data in enumerate(data):
         slide_title = slide_data.get('title', f"Slide {i+1}")
         slide_content = slide_data.get('content', [])
         
-        # Check for Chart Slide/Content
-        chart_placeholder = next((p.strip() for p in slide_content if p.strip().upper().startswith('[CHART:')), None)
-        remaining_content = [p for p in slide_content if not p.strip().upper().startswith('[CHART:')]
+        # Check for Chart Slide/Content (one pass over the points)
+        chart_placeholder = None
+        remaining_content = []
+        for p in slide_content:
+            stripped = p.strip()
+            if stripped.upper().startswith('[CHART:'):
+                if chart_placeholder is None:
+                    chart_placeholder = stripped
+            else:
+                remaining_content.append(p)
 
         # --- A. Generate Chart Slide ---
         if chart_placeholder:
@@ -249,10 +277,7 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
         else:
             # Original logic for default blank presentation: add a new slide
             layout_index = 1 if remaining_content else 5 
-            try:
-                layout = prs.slide_layouts[layout_index] 
-            except IndexError:
-                layout = prs.slide_layouts[0] # Fallback to Title Slide (Index 0 is always safe)
+            layout = content_layout if remaining_content else title_only_layout
 
             slide = prs.slides.add_slide(layout)
 
@@ -297,22 +322,13 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
                 body = body_placeholder.text_frame
                 body.clear() # IMPORTANT: Clears any default text from the template slide
                 
+                add_paragraph = body.add_paragraph
+                space_after = Pt(10)
                 for point in remaining_content:
-                    processed_point = point.strip()
-                    level = 0
-                    
                     # Markdown-like level parsing
-                    if processed_point.startswith('***'):
-                        level = 2
-                        processed_point = processed_point.lstrip('***').strip()
-                    elif processed_point.startswith('**'):
-                        level = 1
-                        processed_point = processed_point.lstrip('**').strip()
-                    elif processed_point.startswith('*'):
-                        level = 0
-                        processed_point = processed_point.lstrip('*').strip()
+                    level, processed_point = _parse_bullet(point)
 
-                    p = body.add_paragraph()
+                    p = add_paragraph()
                     run = p.add_run() 
                     run.text = processed_point
                     
@@ -321,7 +337,7 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
                         _apply_theme_style(run, level, theme_cfg)
                     
                     # Paragraph spacing and bullet level
-                    p.space_after = Pt(10)
+                    p.space_after = space_after
                     p.level = level
 
             except Exception as e:
@@ -340,21 +356,12 @@ def create_pptx_with_style(slides_data, theme_name=DEFAULT_THEME, template_data=
                     tf.clear()
                     tf.vertical_anchor = MSO_ANCHOR.TOP
                     
+                    add_paragraph = tf.add_paragraph
                     for point in remaining_content:
                         # Replicate bullet structure in the fallback
-                        processed_point = point.strip()
-                        level = 0
-                        if processed_point.startswith('***'):
-                            level = 2
-                            processed_point = processed_point.lstrip('***').strip()
-                        elif processed_point.startswith('**'):
-                            level = 1
-                            processed_point = processed_point.lstrip('**').strip()
-                        elif processed_point.startswith('*'):
-                            level = 0
-                            processed_point = processed_point.lstrip('*').strip()
+                        level, processed_point = _parse_bullet(point)
                         
-                        p = tf.add_paragraph()
+                        p = add_paragraph()
                         run = p.add_run()
                         run.text = processed_point
                         p.level = level
@@ -0,0 +1,69 @@
+import functools
+import hashlib
+import os
+import threading
+
+try:
+    import diskcache # Persists the cache across runs
+except ImportError:
+    diskcache = None
+
+# Gemini results (OCR'd page text, cleaned chunks) keyed by a hash of
+# everything that went into the request, so re-processed documents skip the
+# API call. Kept on disk too when diskcache is installed.
+CACHE_MAX_ENTRIES = 1024
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pdf_to_text", "results")
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_disk_cache():
+    """Opens the on-disk cache once, or returns None if it's unavailable."""
+    if diskcache is None:
+        return None
+    try:
+        return diskcache.Cache(CACHE_DIR)
+    except Exception as e:
+        print(f"Warning: Result disk cache unavailable: {e}")
+        return None
+
+
+def cache_key(*parts):
+    """
+    Hashes the request inputs (bytes or str, e.g. image bytes and the model
+    name) into a compact key. Each part is length-prefixed so different
+    splits of the same bytes never collide.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.digest()
+
+
+def cache_get(key):
+    """Returns the cached value for `key`, or None."""
+    with _cache_lock:
+        value = _cache.get(key)
+    if value is None:
+        disk_cache = _get_disk_cache()
+        if disk_cache is not None:
+            value = disk_cache.get(key)
+            if value is not None:
+                cache_put(key, value, persist=False)
+    return value
+
+
+def cache_put(key, value, persist=True):
+    """Stores `value` in memory (oldest entry evicted first) and on disk."""
+    with _cache_lock:
+        if key not in _cache and len(_cache) >= CACHE_MAX_ENTRIES:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = value
+    disk_cache = _get_disk_cache() if persist else None
+    if disk_cache is not None:
+        disk_cache.set(key, value)
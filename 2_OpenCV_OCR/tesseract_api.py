@@ -0,0 +1,36 @@
+import threading
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Shared by ocr_engine (extraction) and classify_image_type (classification),
+# so both read the page the same way
+TESSERACT_CONFIG = r"--psm 6 --oem 3"
+
+_local = threading.local()
+
+
+def get_tesseract_api():
+    """
+    Return this thread's tesserocr PyTessBaseAPI, creating it on first use.
+    The language model is loaded once per thread instead of once per
+    pytesseract call (which spawns a new tesseract process every time).
+    Returns None when tesserocr is not installed.
+    """
+    if tesserocr is None:
+        return None
+
+    api = getattr(_local, "api", None)
+    if api is None:
+        # SINGLE_BLOCK matches the --psm 6 in TESSERACT_CONFIG
+        api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK)
+        _local.api = api
+    return api
+
+
+def set_gray_image(api, gray):
+    """Hand a 2-D uint8 array to tesserocr without going through PIL."""
+    h, w = gray.shape
+    api.SetImageBytes(gray.tobytes(), w, h, 1, w)
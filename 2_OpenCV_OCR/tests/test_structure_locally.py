@@ -0,0 +1,36 @@
+from core_document_generator import _mark_page, _structure_locally
+
+
+def _pages(*texts):
+    """Joins page texts the way the extraction pipeline does."""
+    return "".join(_mark_page(i, text) for i, text in enumerate(texts))
+
+
+def test_prose_with_mid_sentence_page_breaks_goes_to_gemini():
+    raw_text = _pages(
+        "The survey covered three regions over two years. Results from the\nSecond Phase",
+        "of the study were delayed by weather. Analysts then compared the\nNorthern Region",
+        "against the baseline data. The final report was published in\nLate Spring",
+        "after a lengthy review process.",
+    )
+    assert _structure_locally(raw_text) is None
+
+
+def test_markdown_headings_are_structured_locally():
+    raw_text = _pages(
+        "# Introduction\nThe survey covered three regions. It ran for two years.",
+        "## Method\nData was collected monthly.\n## Results\nYields rose in the\n",
+        "northern region. Costs fell.",
+    )
+    assert _structure_locally(raw_text) == [
+        {"title": "Introduction", "content": ["The survey covered three regions.", "It ran for two years."]},
+        {"title": "Method", "content": ["Data was collected monthly."]},
+        {"title": "Results", "content": ["Yields rose in the northern region.", "Costs fell."]},
+    ]
+
+
+def test_text_before_the_first_heading_goes_to_gemini():
+    raw_text = _pages(
+        "Preface text that belongs to no heading.\n# One\nA.\n# Two\nB.\n# Three\nC.",
+    )
+    assert _structure_locally(raw_text) is None
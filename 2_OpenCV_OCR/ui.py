@@ -12,6 +12,7 @@ from core_document_generator import (
     create_markdown_report
 )
 from pptx_designer import create_pptx_with_style
+from slides_json import parse_slides
 
 # --------------------------------
 # CONFIGURATION & SECRET LOADING
@@ -55,7 +56,7 @@ def render_slide_preview(json_data, style_name="Professional"):
     Renders a visual preview of the slides in Streamlit, simulating the chosen style's theme.
     """
     try:
-        data = json.loads(json_data)
+        data = parse_slides(json_data)
         st.info(f"👀 Below is a simplified preview of your slide content, simulating the **{style_name}** theme. The final PPTX will have the correct shapes and formatting.")
         
         # Define simple colors/fonts for the Streamlit preview based on the styles for visual feedback
@@ -74,7 +75,7 @@ def render_slide_preview(json_data, style_name="Professional"):
             col_index = i % 2
             with cols[col_index]:
                 # Use markdown with inline HTML/CSS for a styled card effect
-                slide_html = f"""
+                slide_html = [f"""
                 <div style="
                     border: 3px solid {theme['border']}; 
                     border-radius: 10px; 
@@ -87,25 +88,25 @@ def render_slide_preview(json_data, style_name="Professional"):
                         📄 Slide {i+1}: {slide.get('title', 'Untitled')}
                     </h5>
                     <hr style="border-top: 1px solid #ccc; margin-top: 5px; margin-bottom: 10px;">
-                """
+                """]
                 
                 content = slide.get('content', [])
                 for point in content:
                     point = point.strip()
                     # Simulate bullet levels based on the pptx_designer logic
                     if point.startswith("[CHART:"):
-                        slide_html += f'<p style="color: #9c27b0; font-style: italic;">📊 **Chart Placeholder:** {point.splitlines()[0]}...</p>'
+                        slide_html.append(f'<p style="color: #9c27b0; font-style: italic;">📊 **Chart Placeholder:** {point.splitlines()[0]}...</p>')
                     elif point.startswith("|"):
-                        slide_html += f'<p style="color: #00897b; font-style: italic;">🗓️ **Table Data:** {point.splitlines()[0]}...</p>'
+                        slide_html.append(f'<p style="color: #00897b; font-style: italic;">🗓️ **Table Data:** {point.splitlines()[0]}...</p>')
                     elif point.startswith('***'):
-                        slide_html += f'<p style="margin-left: 40px; font-weight: bold; margin-bottom: 0;">• {point.lstrip("***").strip()}</p>'
+                        slide_html.append(f'<p style="margin-left: 40px; font-weight: bold; margin-bottom: 0;">• {point.lstrip("***").strip()}</p>')
                     elif point.startswith('**'):
-                         slide_html += f'<p style="margin-left: 20px; font-weight: normal; margin-bottom: 0;">• {point.lstrip("**").strip()}</p>'
+                         slide_html.append(f'<p style="margin-left: 20px; font-weight: normal; margin-bottom: 0;">• {point.lstrip("**").strip()}</p>')
                     else:
-                        slide_html += f'<p style="margin-left: 0px; font-weight: normal; margin-bottom: 0;">• {point.lstrip("*").strip()}</p>'
+                        slide_html.append(f'<p style="margin-left: 0px; font-weight: normal; margin-bottom: 0;">• {point.lstrip("*").strip()}</p>')
 
-                slide_html += "</div>"
-                st.markdown(slide_html, unsafe_allow_html=True)
+                slide_html.append("</div>")
+                st.markdown("".join(slide_html), unsafe_allow_html=True)
                 
     except json.JSONDecodeError:
         st.error("Could not render preview: Blueprint is not valid JSON.")
@@ -400,9 +401,10 @@ def main():
                     if edited_json != st.session_state.blueprint_json:
                         st.session_state.blueprint_json = edited_json
                         try:
-                            json.loads(edited_json)
+                            # Parsed through the shared cache the preview reads from
+                            parse_slides(edited_json)
                             st.success("JSON updated locally. Check preview tab.")
-                        except json.JSONDecodeError:
+                        except (ValueError, TypeError):
                             st.error("Invalid JSON format detected. Please correct the structure.")
 
                 with col2:
@@ -421,6 +423,12 @@ def main():
                 st.markdown("### ⬇️ Download Options")
                 
                 final_json = st.session_state.blueprint_json
+                # Parse once for every exporter; invalid JSON is passed through
+                # as-is so each exporter reports the error itself.
+                try:
+                    final_json = parse_slides(final_json)
+                except (ValueError, TypeError):
+                    pass
                 
                 # --- PowerPoint Download (Conditional) ---
                 if is_pptx_output: